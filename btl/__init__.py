@@ -1,7 +1,7 @@
 from .db import ToolDB
 from .library import Library
 from .shape import Shape
-from .tool import Tool
+from .tool import Tool, ToolProxy
 from .machine import Machine
 from .version import get_version_from_git, get_version_from_pkg
 
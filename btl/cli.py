@@ -137,11 +137,43 @@ removetoolparser.add_argument('tool', help='the tool id, or "all"')
 removelibraryparser = removesubparsers.add_parser('library', help='remove the library')
 removelibraryparser.add_argument('library', help='the library id, or "all"')
 
+# "serve" command arguments
+serveparser = subparsers.add_parser('serve', help='serve feeds & speeds and tool lookups over JSON-RPC')
+serveparser.add_argument('-s', '--socket',
+                         help='the path of the Unix socket to listen on')
+serveparser.add_argument('-p', '--port',
+                         type=int,
+                         help='the TCP port to listen on (localhost only)')
+serveparser.add_argument('-w', '--workers',
+                         type=int,
+                         default=4,
+                         help='the maximum number of concurrently executed requests')
+serveparser.add_argument('-c', '--max-connections',
+                         type=int,
+                         default=64,
+                         help='the maximum number of concurrently connected clients')
+
+def serve(serializer, args):
+    from btl.service import FeedsService
+    if bool(args.socket) == bool(args.port):
+        serveparser.error('either --socket or --port is required')
+    address = args.socket or ('127.0.0.1', args.port)
+    service = FeedsService(serializer, workers=args.workers,
+                           max_connections=args.max_connections)
+    print('Serving {} tools on {}'.format(len(service.db.tools), address))
+    try:
+        service.serve(address)
+    except KeyboardInterrupt:
+        pass
+
 def run():
     args = parser.parse_args()
 
     serializer_cls = serializers.serializers[args.format]
     serializer = serializer_cls(args.name)
+    if args.command == 'serve':
+        return serve(serializer, args)
+
     db = ToolDB()
     db.deserialize(serializer)
 
@@ -0,0 +1,116 @@
+"""
+A client for the service in service.py. Example:
+
+    from btl.client import FeedsClient
+
+    with FeedsClient('/tmp/btl.sock') as client:
+        for tool in client.get_tools():
+            print(tool['label'])
+        result = client.calculate(tool_id, machine_id, 'Aluminium6061', 'HSM')
+        print(result['params']['rpm']['value'])
+"""
+import json
+import socket
+import itertools
+
+class ServiceError(Exception):
+    def __init__(self, code, message):
+        super(ServiceError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+class FeedsClient(object):
+    """
+    A connection to a running service. The address is either a path to
+    a Unix socket, or a (host, port) tuple. The connection is opened on
+    the first request and reused for all following ones.
+    Not thread-safe; use one client per thread.
+    """
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self.fp = None
+        self.ids = itertools.count(1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.address if isinstance(self.address, str) else tuple(self.address))
+        self.sock = sock
+        self.fp = sock.makefile('rwb')
+
+    def close(self):
+        if self.fp:
+            self.fp.close()
+            self.fp = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def call(self, method, **params):
+        """
+        Calls the given method and returns its result. Raises a
+        ServiceError if the service returned an error.
+        """
+        if self.sock is None:
+            self.connect()
+        id = next(self.ids)
+        request = {'jsonrpc': '2.0', 'id': id, 'method': method, 'params': params}
+        try:
+            self.fp.write(json.dumps(request).encode('utf-8')+b'\n')
+            self.fp.flush()
+            line = self.fp.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError('connection closed by the service')
+
+        response = json.loads(line)
+        error = response.get('error')
+        if error:
+            raise ServiceError(error['code'], error['message'])
+        return response['result']
+
+    def ping(self):
+        return self.call('ping')
+
+    def reload(self):
+        return self.call('reload')
+
+    def get_libraries(self):
+        return self.call('get_libraries')
+
+    def get_tools(self, library=None):
+        return self.call('get_tools', library=library)
+
+    def get_tool(self, id):
+        return self.call('get_tool', id=id)
+
+    def get_machines(self):
+        return self.call('get_machines')
+
+    def get_materials(self):
+        return self.call('get_materials')
+
+    def get_operations(self):
+        return self.call('get_operations')
+
+    def calculate(self, tool, machine, material, op='Profiling', iterations=80):
+        return self.call('calculate',
+                         tool=tool,
+                         machine=machine,
+                         material=material,
+                         op=op,
+                         iterations=iterations)
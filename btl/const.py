@@ -3,4 +3,12 @@ import os
 __dir__ = os.path.dirname(__file__)
 resource_dir = os.path.join(__dir__, 'resources')
 icon_dir = os.path.join(resource_dir, 'icons')
+material_dir = os.path.join(resource_dir, 'materials')
 translations_dir = os.path.abspath(os.path.join(resource_dir, 'translations'))
+
+# Per-user cache directory, shared by the CLI, qbtl and the workbench.
+cache_dir = os.environ.get('BTL_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME')
+        or os.environ.get('LOCALAPPDATA')
+        or os.path.expanduser(os.path.join('~', '.cache')),
+    'btl')
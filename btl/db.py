@@ -13,6 +13,11 @@ class ToolDB(object):
         self.shapes = dict()  # maps shape name to Shape
         self.machines = dict()  # maps machine ID to Machine
 
+        # For change tracking. Maps (type, id) to the state of each object
+        # as returned by its get_state() method, at the time of the last
+        # load or save. See save_changes().
+        self.saved_states = dict()
+
     def add_library(self, library):
         self.libraries[library.id] = library
 
@@ -131,16 +136,123 @@ class ToolDB(object):
                 self.add_tool(tool)
 
     def serialize(self, serializer):
-        self.serialize_machines(serializer)
-        self.serialize_libraries(serializer)
-        self.serialize_shapes(serializer)
-        self.serialize_tools(serializer)
-
-    def deserialize(self, serializer):
-        self.deserialize_machines(serializer)
-        self.deserialize_libraries(serializer)
-        self.deserialize_shapes(serializer)
-        self.deserialize_tools(serializer)
+        serializer.begin_serialize()
+        try:
+            self.serialize_machines(serializer)
+            self.serialize_libraries(serializer)
+            self.serialize_shapes(serializer)
+            self.serialize_tools(serializer)
+        except BaseException:
+            serializer.abort_serialize()
+            raise
+        serializer.end_serialize()
+        self.mark_saved()
+
+    def deserialize(self, serializer, lazy=False):
+        """
+        Loads everything from the given serializer. If lazy is True, tools
+        may be loaded as ToolProxy objects, which decode the full tool
+        only once it is needed.
+        """
+        serializer.begin_deserialize(lazy=lazy)
+        try:
+            self.deserialize_machines(serializer)
+            self.deserialize_libraries(serializer)
+            self.deserialize_shapes(serializer)
+            self.deserialize_tools(serializer)
+        finally:
+            serializer.end_deserialize()
+        self.mark_saved()
+
+    def _get_states(self):
+        states = {}
+        for machine in self.machines.values():
+            states['machine', machine.id] = machine.get_state()
+        for shape in self.shapes.values():
+            states['shape', shape.name] = shape.get_state()
+        for tool in self.tools.values():
+            states['tool', tool.id] = tool.get_state()
+        for library in self.libraries.values():
+            states['library', library.id] = library.get_state()
+        return states
+
+    def mark_saved(self):
+        """
+        Marks all objects as unchanged.
+        """
+        self.saved_states = self._get_states()
+
+    def get_changes(self, serializer=None):
+        """
+        Returns a tuple (changed, removed), where each is a list of
+        (type, id) tuples, and type is one of "machine", "shape", "tool"
+        or "library". The lists are sorted in the order in which they
+        should be saved.
+
+        If the given serializer stores tools inside the library files,
+        libraries that contain changed tools are also included.
+        """
+        states = self._get_states()
+        changed = [key for key, state in states.items()
+                   if self.saved_states.get(key) != state]
+        removed = [key for key in self.saved_states if key not in states]
+
+        if serializer is not None and serializer.STORES_TOOLS_IN_LIBRARY:
+            changed_tools = set(id for kind, id in changed if kind == 'tool')
+            for library in self.libraries.values():
+                key = 'library', library.id
+                if key not in changed and any(t.id in changed_tools for t in library.tools):
+                    changed.append(key)
+
+        # Save referenced objects before the objects that reference them,
+        # and remove them only after.
+        order = {'machine': 0, 'shape': 1, 'tool': 2, 'library': 3}
+        changed.sort(key=lambda k: order[k[0]])
+        removed.sort(key=lambda k: -order[k[0]])
+        return changed, removed
+
+    def has_changes(self):
+        changed, removed = self.get_changes()
+        return bool(changed or removed)
+
+    def _save_changes(self, serializer, changed, removed):
+        for kind, id in changed:
+            if kind == 'machine':
+                serializer.serialize_machine(self.machines[id])
+            elif kind == 'shape':
+                serializer.serialize_shape(self.shapes[id])
+            elif kind == 'tool':
+                serializer.serialize_tool(self.tools[id])
+            elif kind == 'library':
+                serializer.serialize_library(self.libraries[id])
+        for kind, id in removed:
+            if kind == 'machine':
+                serializer.remove_machine(id)
+            elif kind == 'tool':
+                serializer.remove_tool(id)
+            elif kind == 'library':
+                serializer.remove_library(id)
+            # Shapes are never removed by serialize() either.
+
+    def save_changes(self, serializer):
+        """
+        Like serialize(), but only writes the objects that were changed,
+        added or removed since the last load or save. Returns the number
+        of saved and removed objects.
+        """
+        changed, removed = self.get_changes(serializer)
+        if not changed and not removed:
+            return 0
+
+        serializer.begin_serialize()
+        try:
+            self._save_changes(serializer, changed, removed)
+        except BaseException:
+            serializer.abort_serialize()
+            raise
+        serializer.end_serialize()
+        self.mark_saved()
+        return len(changed)+len(removed)
 
     def dump(self, unused_tools=True, summarize=False, builtin=False):
         if builtin:
@@ -0,0 +1,126 @@
+"""
+Reads object properties from FreeCAD documents (.fcstd) without FreeCAD.
+
+A .fcstd file is a zip archive. The properties of all objects are stored
+in its Document.xml, so they can be read directly, which is much faster
+than opening and closing the document in FreeCAD, and also works headless.
+"""
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Maps FreeCAD property types that hold a quantity to the type of unit,
+# and the unit that FreeCAD stores the value in.
+quantity_types = {
+    'App::PropertyLength': ('Length', 'mm'),
+    'App::PropertyDistance': ('Length', 'mm'),
+    'App::PropertyAngle': ('Angle', '°'),
+    'App::PropertyArea': ('Area', 'mm^2'),
+    'App::PropertyVolume': ('Volume', 'mm^3'),
+    'App::PropertySpeed': ('Velocity', 'mm/s'),
+    'App::PropertyAcceleration': ('Acceleration', 'mm/s^2'),
+    'App::PropertyForce': ('Force', 'mN'),
+    'App::PropertyPressure': ('Pressure', 'kPa'),
+}
+
+class Unit(object):
+    def __init__(self, type):
+        self.Type = type
+
+class Quantity(object):
+    """
+    Mimics the parts of FreeCAD's Quantity that BTL uses.
+    """
+    def __init__(self, value, unit_type, unit):
+        self.Value = value
+        self.Unit = Unit(unit_type)
+        self.unit = unit
+
+    def __repr__(self):
+        return 'Quantity({!r}, {!r})'.format(self.Value, self.unit)
+
+    def getUserPreferred(self):
+        return '{} {}'.format(self.Value, self.unit), 1.0, self.unit
+
+def _parse_bool(value):
+    return value == 'true'
+
+def _get_value(prop_type, elem):
+    """
+    Returns a tuple (value, enums) for the given <Property> element, with
+    the value converted like FreeCAD does when reading the property.
+    """
+    child = elem[0] if len(elem) else None
+    if child is None:
+        raise ValueError('property has no value')
+    value = child.get('value')
+
+    if prop_type == 'App::PropertyEnumeration':
+        enum_list = elem.find('CustomEnumList')
+        if enum_list is None:
+            return int(value), None
+        enums = [e.get('value') for e in enum_list.iter('Enum')]
+        index = int(value)
+        return (enums[index] if 0 <= index < len(enums) else ''), enums
+    elif prop_type in quantity_types:
+        unit_type, unit = quantity_types[prop_type]
+        return Quantity(float(value), unit_type, unit), None
+    elif child.tag == 'Bool':
+        return _parse_bool(value), None
+    elif child.tag == 'Integer':
+        return int(value), None
+    elif child.tag == 'Float':
+        return float(value), None
+    elif child.tag == 'String':
+        return value, None
+    raise ValueError('unsupported property type ' + prop_type)
+
+def _find_object_by_label(root, label):
+    object_data = root.find('ObjectData')
+    if object_data is None:
+        return None
+    for obj in object_data.iter('Object'):
+        properties = obj.find('Properties')
+        if properties is None:
+            continue
+        for elem in properties.iter('Property'):
+            if elem.get('name') != 'Label':
+                continue
+            string = elem.find('String')
+            if string is not None and string.get('value') == label:
+                return properties
+            break
+    return None
+
+def read_object_properties(filename, label):
+    """
+    Returns a list of (group, name, prop, enums) tuples for the properties
+    of the object with the given label in the given FreeCAD document, or
+    None if there is no such object. Properties without a group, and
+    those of group "Base", are skipped, as they are not user defined.
+    Raises OSError if the file cannot be read, and ValueError if it is not
+    a valid FreeCAD document.
+    """
+    try:
+        with zipfile.ZipFile(filename) as zf:
+            data = zf.read('Document.xml')
+        root = ET.fromstring(data)
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        raise ValueError('{} is not a valid FreeCAD document: {}'.format(filename, e))
+
+    properties = _find_object_by_label(root, label)
+    if properties is None:
+        return None
+
+    result = []
+    for elem in properties.iter('Property'):
+        group = elem.get('group', '')
+        if group in ('', 'Base'):
+            continue
+        name = elem.get('name')
+        prop_type = elem.get('type')
+        try:
+            prop, enums = _get_value(prop_type, elem)
+        except ValueError as e:
+            raise ValueError('{}: property {}: {}'.format(filename, name, e))
+        result.append((group, name, prop, enums))
+    return result
@@ -1,7 +1,10 @@
 import os
 import re
+import atexit
 from . import params
-from .util import sha256sum
+from .const import cache_dir
+from .fcstd import read_object_properties
+from .shapecache import ShapePropertyCache
 
 def parse_float_with_unit(distance, default_unit='mm'):
     if not distance:
@@ -99,60 +102,24 @@ def tool_property_to_param(groupname, propname, prop, enums, value):
           f'whoops - param {propname} with type {param.type} not implemented')
     return param
 
-shape_cache = {}
+shape_cache = ShapePropertyCache(os.path.join(cache_dir, 'shape-properties.json'))
+atexit.register(shape_cache.flush)
 
-def load_shape_properties(filename):
-    # Loading those is quite slow - well, actually it is CLOSING a FreeCAD
-    # file that is slow, see .closeDocument() below.
-    # In any case, we cache shapes as a workaround.
-    global shape_cache
-    filehash = sha256sum(filename)
-    cache = shape_cache.get(filename)
-
-    if cache:
-        cachehash, properties = cache
-        if cachehash == filehash:
-            return properties
-
-    # Load the shape file using FreeCad. Unfortunately this causes everything
-    # in the current document to be unselected, so we need to restore the
-    # selection later.
-    import FreeCAD
-    olddoc = FreeCAD.activeDocument()
-    if FreeCAD.GuiUp:
-        import FreeCADGui
-        oldselection = FreeCADGui.Selection.getSelection()
-    doc = FreeCAD.openDocument(filename, hidden=True)
-
-    # Find the Attribute object.
-    attrs_list = doc.getObjectsByLabel('Attributes')
-    try:
-        attrs = attrs_list[0]
-    except IndexError:
+def read_shape_properties(filename):
+    # Reading the properties from the file directly is much faster than
+    # loading it in FreeCAD (closing a document in FreeCAD alone takes
+    # ~400ms), and works without FreeCAD.
+    properties = read_object_properties(filename, 'Attributes')
+    if properties is None:
         raise Exception(f'shape file {filename} has no "Attributes" FeaturePython object.\n'\
                       + ' Check the parameter definition in your shape file')
-
-    properties = []
-    for propname in attrs.PropertiesList:
-        prop = getattr(attrs, propname)
-        groupname = attrs.getGroupOfProperty(propname)
-        if groupname in ('', 'Base'):
-            continue
-        enums = attrs.getEnumerationsOfProperty(propname)
-        properties.append((groupname, propname, prop, enums))
-
-    # Note that .closeDocument() is extremely slow; it takes
-    # almost 400ms per document - much longer than opening!
-    FreeCAD.closeDocument(doc.Name)
-    if olddoc:
-        FreeCAD.setActiveDocument(olddoc.Name)
-    if FreeCAD.GuiUp:
-        for sel in oldselection:
-            FreeCADGui.Selection.addSelection(olddoc.Name, sel.Name)
-
-    shape_cache[filename] = filehash, properties
     return properties
 
+def load_shape_properties(filename):
+    # Shapes are requested for every tool, so they are cached, also across
+    # sessions.
+    return shape_cache.get(filename, read_shape_properties)
+
 def get_selected_job():
     try:
         import FreeCADGui
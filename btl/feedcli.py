@@ -1,16 +1,45 @@
 #!/usr/bin/python
 import sys
+import argparse
 from btl import Tool, Machine
 from btl.shape import builtin_shapes
 from btl.toolmaterial import HSS, Carbide
 from btl.feeds import FeedCalc, material, operation
+from btl.feeds.engagement import EngagementMap
 from btl.toolpixmap import EndmillPixmap, BullnosePixmap, ChamferPixmap, VBitPixmap
 
 def print_result(params):
     for name, param in sorted(params.items(), key=lambda x: x[0].lower()):
         print(f"{name: <18}: {param.to_string(decimals=10)}")
 
-def run(op):
+def print_pareto(results, choices):
+    print(f"{len(results)} Pareto optimal results:")
+    print(f"  {'MRR': >10} {'Deflection': >10} {'Load': >6} {'Radial F': >9}")
+    for error, params in results:
+        choice = [name for name, result in choices.items() if result[1] is params]
+        print(f"  {params['mrr'].format(): >10}"
+              f" {params['deflection'].format(): >10}"
+              f" {params['spindle_load'].format(): >6}"
+              f" {params['radial_force'].format(): >9}"
+              f" {', '.join(choice)}")
+    for name, (error, params) in choices.items():
+        print(f"\n{name.capitalize()}:")
+        print_result(params)
+
+def save_map(filename, tool, mat, params, quantity='overlap', resolution=100):
+    # Renders the engagement map of the tool, with the result marked.
+    engagement = EngagementMap.from_tool(tool, resolution)
+    engagement.calculate_deflection(mat,
+                                    params['speed'].v,
+                                    params['adjusted_chipload'].v)
+    if filename.lower().endswith('.csv'):
+        engagement.save_csv(filename)
+    else:
+        point = params['doc'].v, params['woc'].v
+        engagement.save_png(filename, quantity, point=point)
+    print(f"Engagement map written to {filename}")
+
+def run(op, show_stats=False, pareto=False, map_filename=None, map_quantity='overlap'):
     machine = Machine(max_power=2.2,
                       min_rpm=3000,
                       max_rpm=22000,
@@ -37,14 +66,28 @@ def run(op):
     #fc.doc.min = 8
     print(f"Running {op.label()} operation on {fc.material.name} using a {tool_material.name} tool")
 
-    error, best = fc.start()
+    if pareto:
+        results, choices = fc.calculate_pareto()
+        if show_stats:
+            fc.stats.dump()
+        if not results:
+            print("No valid result found.")
+            sys.exit(1)
+        print_pareto(results, choices)
+        return
+
+    result = fc.start()
+    error, best = result
+    if show_stats:
+        result.stats.dump()
     if error is not None:
         print(f"No valid result found. Error message: {error}")
         print_result(best)
         sys.exit(1)
 
     print_result(best)
-    #endmill.pixmap.show_engagement(best['doc'].v, best['woc'].v)
+    if map_filename:
+        save_map(map_filename, endmill, mat, best, map_quantity)
 
 if __name__ == '__main__':
     #px = EndmillPixmap(20, 6, 5, 10)
@@ -52,6 +95,26 @@ if __name__ == '__main__':
     #px = VBitPixmap(14, 5, 10, 1.5, 45, .5)
     #px = ChamferPixmap(16, 6, 15, 2, 5)
     #px.show_engagement(0.1, 0.1)
-    #import cProfile
-    #cProfile.run("run(operation.HSM)")
-    run(operation.HSM)
+    parser = argparse.ArgumentParser(description='Runs the feeds & speeds calculator on a test tool')
+    parser.add_argument('--stats',
+                        action='store_true',
+                        help='print counters and timers of the calculation')
+    parser.add_argument('--pareto',
+                        action='store_true',
+                        help='print the Pareto optimal results instead of the best one')
+    parser.add_argument('--map',
+                        metavar='FILENAME',
+                        help='write the DOC×WOC engagement map of the tool, with the'
+                             ' result marked, to a PNG or CSV file')
+    parser.add_argument('--map-quantity',
+                        choices=EngagementMap.quantities,
+                        default='overlap',
+                        help='the quantity shown in a PNG map (default: overlap)')
+    args = parser.parse_args()
+    if args.map and args.pareto:
+        parser.error('--map cannot be used with --pareto')
+    run(operation.HSM,
+        show_stats=args.stats,
+        pareto=args.pareto,
+        map_filename=args.map,
+        map_quantity=args.map_quantity)
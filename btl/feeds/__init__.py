@@ -1 +1,3 @@
 from .calc import FeedCalc
+from .engagement import EngagementMap
+from .stepdown import StepdownPlanner
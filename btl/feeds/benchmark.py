@@ -0,0 +1,320 @@
+"""
+Benchmark suite for the feeds & speeds calculator.
+
+Runs FeedCalc.start() for every operation, on every tool shape that has
+a ToolPixmap, on a few machines and all materials, and records the time
+per start(), the evaluations per optimize() run, the peak memory, and
+the resulting MRR.
+
+Usage:
+
+    python -m btl.feeds.benchmark --threshold 10
+    python -m btl.feeds.benchmark --save
+
+The first command compares against the baseline and exits with a
+non-zero status if any case regressed by more than the given percentage.
+The second records a new baseline. Baselines are recorded by each user,
+and stored in the btl cache directory; pass --baseline to use another
+file.
+
+Timings depend on the computer, so they are only compared if the
+baseline was recorded on the same host. The other metrics do not
+depend on the speed of the computer, but may change with the versions
+of Python, numpy and scipy; nothing is compared if those differ.
+"""
+import os
+import sys
+import json
+import platform
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import scipy
+from .. import const
+from ..machine import Machine
+from ..shape import Shape
+from ..tool import Tool
+from ..params import IntParam, DistanceParam, AngleParam
+from ..toolmaterial import Carbide
+from . import operation
+from .calc import FeedCalc
+from .material import materials
+
+BASELINE_VERSION = 2
+
+default_baseline = os.path.join(const.cache_dir, 'benchmark_baseline.json')
+
+stickout = 20 # mm
+
+# Tool shapes that have a ToolPixmap, and their geometry.
+tool_shapes = {
+    'endmill': {'Diameter': 6, 'CuttingEdgeHeight': 15},
+    'torus': {'Diameter': 6, 'CuttingEdgeHeight': 15, 'TorusRadius': 1},
+    'ballend': {'Diameter': 6, 'CuttingEdgeHeight': 15},
+    'chamfer': {'Diameter': 6, 'CuttingEdgeHeight': 3, 'Radius': 2},
+    'vbit': {'Diameter': 6, 'CuttingEdgeHeight': 3, 'TipDiameter': 0.5,
+             'CuttingEdgeAngle': 90},
+    'drill': {'Diameter': 6, 'CuttingEdgeHeight': 15, 'TipAngle': 118},
+    # Shapes that use a ProfilePixmap.
+    'dovetail': {'Diameter': 10, 'CuttingEdgeHeight': 5, 'CuttingAngle': 30},
+    'threadmill': {'Diameter': 6, 'NeckDiameter': 4, 'Crest': 0.2,
+                   'cuttingAngle': 60},
+    '_fusion_tapered_mill': {'Diameter': 6, 'CuttingEdgeHeight': 15,
+                             'TorusRadius': 0.5, 'TaperAngle': 3},
+}
+
+def get_machines():
+    return [
+        Machine('Router',
+                max_power=2.2,
+                min_rpm=3000,
+                max_rpm=22000,
+                peak_torque_rpm=5020,
+                max_feed=5000),
+        Machine('VFD spindle',
+                max_power=1.5,
+                min_rpm=6000,
+                max_rpm=24000,
+                max_feed=3000,
+                torque_curve=[(6000, 0.6), (12000, 1.19), (18000, 0.8), (24000, 0.6)]),
+        Machine('Mill',
+                max_power=5,
+                min_rpm=100,
+                max_rpm=8000,
+                peak_torque_rpm=2000,
+                max_feed=3000),
+    ]
+
+def create_tool(shape_name):
+    shape = Shape(shape_name)
+    for name, value in tool_shapes[shape_name].items():
+        if name.endswith('Angle'):
+            shape.set_param(name, AngleParam(name=name, v=value))
+        else:
+            shape.set_param(name, DistanceParam(name=name, v=value))
+    shape.set_param('ShankDiameter', DistanceParam(name='ShankDiameter', v=6))
+    shape.set_param('Flutes', IntParam(name='Flutes', v=3))
+    tool = Tool(shape_name, shape)
+    tool.set_stickout(stickout, 'mm')
+    tool.set_material(Carbide)
+    return tool
+
+def get_cases():
+    """
+    Returns a list of (name, machine, tool, material, op) tuples.
+    """
+    cases = []
+    machines = get_machines()
+    for shape_name in tool_shapes:
+        tool = create_tool(shape_name)
+        for op in operation.operations:
+            for machine in machines:
+                for material in materials:
+                    name = '/'.join((op.__name__, shape_name, machine.label, material.id))
+                    cases.append((name, machine, tool, material, op))
+    return cases
+
+def run_case(machine, tool, material, op, iterations, repeat=3, measure_memory=True,
+             interpolate=False):
+    """
+    Returns a dict with the results of the given case. The case is run
+    repeat times, and the fastest time is reported to reduce noise.
+    """
+    try:
+        FeedCalc(machine, tool, material, op=op, interpolate=interpolate)
+    except AttributeError as e:
+        return {'skipped': str(e)}
+
+    seconds = None
+    for i in range(repeat):
+        fc = FeedCalc(machine, tool, material, op=op, interpolate=interpolate)
+        start = time.perf_counter()
+        result = fc.start(iterations=iterations)
+        elapsed = time.perf_counter()-start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    error, params = result
+    stats = result.stats
+
+    peak_memory = None
+    if measure_memory:
+        # Measured in a second run, as tracing slows down the calculation.
+        fc = FeedCalc(machine, tool, material, op=op, interpolate=interpolate)
+        tracemalloc.start()
+        fc.start(iterations=iterations)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'time': seconds,
+        'evaluations_per_optimize': stats.get_total_evaluations()/stats.get_restarts(),
+        'success_rate': stats.get_success_rate(),
+        'peak_memory': peak_memory,
+        'mrr': params['mrr'].v if error is None else 0,
+        'error': error,
+    }
+
+def get_host():
+    # The host name alone is not unique (e.g. for virtual machines).
+    return '{} ({}, {} CPUs)'.format(platform.node(),
+                                    platform.machine(),
+                                    os.cpu_count())
+
+def get_versions():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+    }
+
+def run(iterations=10, pattern=None, repeat=3, measure_memory=True, verbose=True,
+        interpolate=False):
+    results = {}
+    for name, machine, tool, material, op in get_cases():
+        if pattern and pattern not in name:
+            continue
+        result = run_case(machine, tool, material, op, iterations, repeat,
+                          measure_memory, interpolate)
+        results[name] = result
+        if verbose and 'skipped' not in result:
+            print(f"{name: <56} {result['time']:8.3f}s"
+                  f" {result['evaluations_per_optimize']:6.1f} evals"
+                  f" MRR {result['mrr']:8.2f}")
+    return {
+        'version': BASELINE_VERSION,
+        'host': get_host(),
+        'versions': get_versions(),
+        'iterations': iterations,
+        'interpolate': interpolate,
+        'cases': results,
+    }
+
+# Metrics that are compared against the baseline for each case, and
+# whether higher values are better. Single cases take only milliseconds,
+# so their times are too noisy to compare; instead, time is compared per
+# operation and in total.
+metrics = (
+    ('evaluations_per_optimize', False),
+    ('peak_memory', False),
+    ('mrr', True),
+)
+
+def compare(baseline, current, threshold):
+    """
+    Returns a list of regressions, as strings. threshold is the allowed
+    change in percent. Returns no regressions if the baseline was recorded
+    with other versions of Python, numpy or scipy.
+    """
+    if baseline.get('version') != BASELINE_VERSION:
+        raise AttributeError('baseline has version {}, not {}; record a new one with --save'.format(
+            baseline.get('version'), BASELINE_VERSION))
+    if baseline['iterations'] != current['iterations']:
+        raise AttributeError('baseline was recorded with {} iterations, not {}'.format(
+            baseline['iterations'], current['iterations']))
+    if baseline.get('interpolate', False) != current['interpolate']:
+        raise AttributeError('baseline was recorded with interpolate={}'.format(
+            baseline.get('interpolate', False)))
+
+    if baseline['versions'] != current['versions']:
+        return []
+
+    regressions = []
+    for name, result in current['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None or 'skipped' in base or 'skipped' in result:
+            continue
+        for metric, higher_is_better in metrics:
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if higher_is_better:
+                regressed = new < old*(1-threshold/100)
+            else:
+                regressed = new > old*(1+threshold/100)
+            if regressed:
+                regressions.append(f'{name}: {metric} {old:.6g} -> {new:.6g}')
+
+    if baseline.get('host') != current.get('host'):
+        return regressions
+
+    old_times, new_times = {}, {}
+    for name, result in current['cases'].items():
+        base = baseline['cases'].get(name, {})
+        if 'time' not in result or 'time' not in base:
+            continue
+        for group in (name.split('/')[0], 'total'):
+            old_times[group] = old_times.get(group, 0)+base['time']
+            new_times[group] = new_times.get(group, 0)+result['time']
+    for group, old_time in old_times.items():
+        new_time = new_times[group]
+        if new_time > old_time*(1+threshold/100):
+            regressions.append(f'{group}: time {old_time:.3f}s -> {new_time:.3f}s')
+    return regressions
+
+def positive_int(value):
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError('must be at least 1')
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the feeds & speeds calculator')
+    parser.add_argument('--baseline',
+                        default=default_baseline,
+                        help='the baseline JSON file to compare against (or to save);'
+                             ' default: '+default_baseline)
+    parser.add_argument('--save',
+                        action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=10,
+                        help='allowed regression in percent (default: 10)')
+    parser.add_argument('--iterations',
+                        type=positive_int,
+                        default=10,
+                        help='optimizer restarts per start() call (default: 10)')
+    parser.add_argument('--repeat',
+                        type=positive_int,
+                        default=3,
+                        help='runs per case; the fastest time is used (default: 3)')
+    parser.add_argument('--filter',
+                        help='only run cases whose name contains this string')
+    parser.add_argument('--interpolate',
+                        action='store_true',
+                        help='interpolate pixmap lookups (see Tool.get_pixmap())')
+    parser.add_argument('--no-memory',
+                        action='store_true',
+                        help='do not measure peak memory (twice as fast)')
+    args = parser.parse_args()
+
+    if not args.save and not os.path.exists(args.baseline):
+        parser.error('no baseline at {}; record one with --save'.format(args.baseline))
+
+    current = run(args.iterations, args.filter, args.repeat, not args.no_memory,
+                  interpolate=args.interpolate)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as fp:
+            json.dump(current, fp, sort_keys=True, indent=2)
+        return
+
+    with open(args.baseline, 'r') as fp:
+        baseline = json.load(fp)
+    if baseline.get('versions') != current['versions']:
+        print('Baseline was recorded with other versions of Python, numpy or scipy'
+              ' ({}); not comparing.'.format(baseline.get('versions')))
+    elif baseline.get('host') != current['host']:
+        print('Baseline was recorded on another host; not comparing times.')
+    try:
+        regressions = compare(baseline, current, args.threshold)
+    except AttributeError as e:
+        parser.error(str(e))
+    for regression in regressions:
+        print('REGRESSION:', regression)
+    if regressions:
+        sys.exit(1)
+    print('No regressions.')
+
+if __name__ == '__main__':
+    main()
@@ -3,31 +3,63 @@ import warnings
 from scipy.optimize import minimize
 import numpy as np
 import random
+from time import perf_counter
 from copy import deepcopy
 from ..params import Param, IntParam, FloatParam
 from . import operation
+from .stats import FeedCalcStats
+from .pareto import EvaluationArchive, get_choices
 
 class InputParam(FloatParam):
+    __slots__ = ()
     is_internal = False
 
 class IntVar(IntParam):
+    __slots__ = ()
     is_internal = False
 
 class FloatVar(FloatParam):
+    __slots__ = ()
     is_internal = False
 
 class IntConst(IntParam):
+    __slots__ = ()
     is_internal = True
 
 class FloatConst(FloatParam):
+    __slots__ = ()
     is_internal = True
 
+class FeedCalcResult(tuple):
+    """
+    A result of the calculation. For compatibility, this is a tuple
+    (error, params), but it also carries the statistics of the
+    calculation that produced it in the stats attribute.
+    """
+    def __new__(cls, error, params, stats=None):
+        result = super(FeedCalcResult, cls).__new__(cls, (error, params))
+        result.stats = stats
+        return result
+
+    def __getnewargs__(self):
+        # Used by copy and pickle; tuple's default drops the stats.
+        return self[0], self[1], self.stats
+
 class FeedCalc(object):
-    def __init__(self, machine, endmill, material, op=operation.Slotting):
+    def __init__(self, machine, endmill, material, op=operation.Slotting,
+                 interpolate=False):
         self.machine = machine
         self.endmill = endmill
         self.material = material
         self.op = op
+        # Whether to interpolate pixmap lookups between pixels (see
+        # Tool.get_pixmap()). This can find better results, at the cost
+        # of more evaluations.
+        self.interpolate = interpolate
+        self.stats = FeedCalcStats()
+        self.random = random.Random(1)
+        self._evaluation_time = 0
+        self.archive = None  # An EvaluationArchive in multi-objective mode
 
         # Perform some sanity checks.
         if op not in operation.operations:
@@ -101,6 +133,7 @@ class FeedCalc(object):
         # to display them with limits and error distance.
         # Their main purpose is providing info for debugging.
         self.available_torque = FloatConst(0.00001, 9999, 2, 'Nm')
+        self.spindle_load = FloatConst(0, 9999, 1, '%') # of the torque available at this RPM
         self.material_power_factor = FloatConst(0, 999, 8)
         self.speed_factor = FloatConst(0, 999, 2, v=1)
         self.chip_factor = FloatConst(0, 999, 2, v=1)
@@ -132,7 +165,7 @@ class FeedCalc(object):
     def reshuffle(self):
         for param in self.params.values():
             if isinstance(param, InputParam):
-                param.assign_random()
+                param.assign_random(self.random)
 
     def reset_limits(self):
         for param in self.all_params.values():
@@ -146,6 +179,13 @@ class FeedCalc(object):
                 raise AttributeError(f"Parameter {name} must be between {param.min} and {param.max}/{param.limit}, but is {param}")
 
     def validate(self):
+        start = perf_counter()
+        try:
+            self._validate()
+        finally:
+            self.stats.add_time('validate', perf_counter()-start)
+
+    def _validate(self):
         self.machine.validate()
         self.endmill.validate()
         self.validate_params()
@@ -186,12 +226,18 @@ class FeedCalc(object):
         # that aims to choose the best result out of many based on
         # an error distance, which takes the constraints into account.
         # See .optimize()
+        start = perf_counter()
         self.op.optimize_cut(self, self.endmill, self.material)
+        end = perf_counter()
+        self.stats.add_time('optimize_cut', end-start)
 
         # Step 2:
         # Apply "classic" equations, in dependency order, assuming we have
         # selected DOC, WOC, SPEED, and CHIPLOAD:
-        self.overlap_area.v = self.op.get_overlap(self.endmill, self.doc.v, self.woc.v)
+        start = end
+        self.overlap_area.v = self.op.get_overlap(self.endmill, self.doc.v, self.woc.v,
+                                                self.interpolate)
+        self.stats.add_time('overlap', perf_counter()-start)
         self.rpm.v = self.speed.v*1000 / (self.effective_diameter.v*math.pi)
         self.adjusted_chipload.v = self.chipload.v*self.feed_factor.v
         self.feed.v = self.adjusted_chipload.v*self.endmill.shape.get_flutes()*self.rpm.v
@@ -228,6 +274,7 @@ class FeedCalc(object):
         self.axial_force.v = axial_force*60 # in N
 
         # Get the deflection (multi-part bar)
+        start = perf_counter()
         self.deflection.v = self.endmill.get_deflection(self.doc.v, self.radial_force.v)
         self.max_deflection.v = self.endmill.get_max_deflection(self.power.v/self.speed.v)
 
@@ -235,15 +282,24 @@ class FeedCalc(object):
         # Calculate the force before permanently bending the end mill.
         self.bend_force_limit.v = self.endmill.get_bend_limit(self.doc.v)
         self.radial_force.set_limit(min(self.bend_force_limit.v, self.radial_force.limit))
+        self.stats.add_time('deflection', perf_counter()-start)
 
         # Step 6:
         # How much torque is available at this RPM?
         self.available_torque.v = self.machine.get_torque_at_rpm(self.rpm.v)
         self.torque.set_limit(min(self.available_torque.v, self.torque.limit))
+        self.spindle_load.v = self.torque.v/self.available_torque.v*100
+
+        # The power available at this RPM is limited by the torque curve,
+        # not only by the maximum power of the machine.
+        available_power = self.machine.get_power_at_rpm(self.rpm.v)
+        self.power.set_limit(min(available_power, self.power.limit))
 
         # Step 7:
         # Maximum torque to shear the end mill
+        start = perf_counter()
         self.twist_torque_limit.v = self.endmill.get_twist_limit()
+        self.stats.add_time('deflection', perf_counter()-start)
         self.torque.set_limit(min(self.twist_torque_limit.v, self.torque.limit))
         self.available_torque.v = min(self.available_torque.v, self.torque.limit)
 
@@ -266,15 +322,23 @@ class FeedCalc(object):
         return -self.mrr.v # weighted. including doc to prioritize it over woc
 
     def _evaluate_point(self, point):
+        self.stats.count_evaluation()
+        start = perf_counter()
         self.speed.v = point[0]
         self.chipload.v = point[1]
         self.woc.v = point[2]
         self.doc.v = point[3]
         self.update()
         #print("EVAL", point, self.get_score(), self.get_error())
-        return self.get_score()
+        score = self.get_score()
+        if self.archive is not None and score < 0:
+            self.archive.add(self, point)
+        self._evaluation_time += perf_counter()-start
+        return score
 
     def optimize(self):
+        self.stats.start_restart()
+
         # Try to find a valid initial point by assigning random values to all
         # parameters. But if that fails, continue trying to have the optimizer
         # figure it out anyway.
@@ -293,6 +357,8 @@ class FeedCalc(object):
                   (self.woc.min, self.woc.limit),
                   (self.doc.min, self.doc.limit)]
         np.set_printoptions(formatter={'float': lambda x: "{0:0.10f}".format(x)})
+        self._evaluation_time = 0
+        start = perf_counter()
         with warnings.catch_warnings():  # ignore "out-of bounds" warning
             warnings.simplefilter("ignore", category=RuntimeWarning)
             result = minimize(self._evaluate_point,
@@ -303,6 +369,8 @@ class FeedCalc(object):
                               #method='Nelder-Mead',
                               #method='TNC',
                               tol=0.001)
+        scipy_time = perf_counter()-start-self._evaluation_time
+        self.stats.add_time('scipy', scipy_time)
 
         # Load & recalculate the best result.
         self.speed.v, self.chipload.v, self.woc.v, self.doc.v = result.x
@@ -311,14 +379,23 @@ class FeedCalc(object):
 
     def calculate(self, progress_cb=None, iterations=80):
         """
-        Returns a list of results, where each result is a tuple:
+        Returns a list of results, where each result is a FeedCalcResult,
+        i.e. a tuple:
 
-          (error_distance, error, params)
+          (error, params)
 
         - error (str): An error message, if the result is invalid. None otherwse.
         - params (dict): The list of params, as stored in .all_params.
+
+        The statistics of the calculation are available in the stats
+        attribute of each result (and in self.stats).
         """
-        random.seed(1) # we don't want true randomness, rather reproducible results
+        # We don't want true randomness, rather reproducible results. Each
+        # calculator has its own generator, so concurrent calculations do
+        # not affect each other.
+        self.random.seed(1)
+        self.stats = FeedCalcStats()
+        start = perf_counter()
 
         results = []
         for i in range(iterations):
@@ -329,12 +406,14 @@ class FeedCalc(object):
                 err = str(e)
             else:
                 err = None
+                self.stats.successful_restarts += 1
             params = deepcopy(self.all_params)
-            result = err, params
+            result = FeedCalcResult(err, params, self.stats)
             results.append(result)
             if progress_cb:
                 progress_cb(100/iterations*i*0.01)
 
+        self.stats.add_time('total', perf_counter()-start)
         return results
 
     def start(self, progress_cb=None, iterations=80):
@@ -344,3 +423,39 @@ class FeedCalc(object):
         results = self.calculate(progress_cb, iterations=iterations)
         results = sorted(results, key=lambda x: x[1]['score'].v)
         return results[0]
+
+    def calculate_pareto(self, progress_cb=None, iterations=80):
+        """
+        Multi-objective mode. Like calculate(), but returns the results
+        that are Pareto optimal with respect to MRR (higher is better),
+        and deflection, spindle load and radial force (lower is better).
+
+        The candidates are all valid points that the optimizer evaluated
+        during its restarts, so no extra optimizer passes are needed;
+        only the points on the front are recalculated to get their params.
+
+        Returns a tuple (results, choices):
+
+        - results: A list of FeedCalcResult, sorted by MRR in descending
+          order. All of them are valid.
+        - choices: A dict mapping 'conservative', 'balanced' and
+          'aggressive' to one of the results. Empty if there are no
+          valid results.
+        """
+        self.archive = EvaluationArchive()
+        try:
+            self.calculate(progress_cb, iterations=iterations)
+        finally:
+            archive, self.archive = self.archive, None
+
+        front = archive.get_front()
+        results = []
+        for point, values in front:
+            self.speed.v, self.chipload.v, self.woc.v, self.doc.v = point
+            self.update()
+            params = deepcopy(self.all_params)
+            results.append(FeedCalcResult(None, params, self.stats))
+
+        choices = get_choices(front)
+        choices = dict((name, results[i]) for name, i in choices.items())
+        return results, choices
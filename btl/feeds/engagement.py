@@ -0,0 +1,117 @@
+import math
+import numpy as np
+import matplotlib.pyplot as plt
+from .util import get_lead_angle_deflection_factors
+
+class EngagementMap(object):
+    """
+    Evaluates a tool over a full DOC×WOC grid in one vectorized pass.
+
+    All maps are 2D arrays indexed [doc, woc]. Cells where the WOC
+    exceeds the effective diameter at that DOC are not reachable and
+    are set to NaN.
+    """
+    quantities = 'overlap', 'effective_diameter', 'deflection'
+
+    def __init__(self, tool, docs, wocs):
+        self.tool = tool
+        self.docs = np.asarray(docs, dtype=float)
+        self.wocs = np.asarray(wocs, dtype=float)
+
+        pixmap = tool.get_pixmap()
+        docs, wocs = np.meshgrid(self.docs, self.wocs, indexing='ij')
+        diameters = pixmap.get_effective_diameters_from_docs(self.docs)
+        self.effective_diameter = np.repeat(diameters[:, np.newaxis],
+                                            len(self.wocs),
+                                            axis=1)
+        self.overlap = pixmap.get_overlaps_from_wocs(docs, wocs)
+        self.valid = wocs <= self.effective_diameter
+        self.deflection = None
+
+    @classmethod
+    def from_tool(cls, tool, resolution=100):
+        """
+        Creates a map covering the full cutting edge and diameter of the
+        given tool, with the given number of steps along each axis.
+        """
+        cutting_edge = tool.shape.get_cutting_edge() or tool.get_stickout()
+        diameter = tool.shape.get_diameter()
+        docs = np.linspace(cutting_edge/resolution, cutting_edge, resolution)
+        wocs = np.linspace(diameter/resolution, diameter, resolution)
+        return cls(tool, docs, wocs)
+
+    def calculate_deflection(self, material, speed, chipload):
+        """
+        Populates the deflection map for a cut at the given speed (m/min)
+        and chipload (mm), using the same equations as FeedCalc.update().
+        The chipload is the adjusted chipload, i.e. including any chip
+        thinning factor. Returns the deflection map in mm.
+        """
+        docs, wocs = np.meshgrid(self.docs, self.wocs, indexing='ij')
+        diameters = self.effective_diameter
+
+        rpm = speed*1000/(diameters*math.pi)
+        feed = chipload*self.tool.shape.get_flutes()*rpm
+        mrr = feed*self.overlap/1000
+        power = mrr*material.power_factor
+
+        radial_factor, _ = get_lead_angle_deflection_factors(docs, wocs, diameters)
+        radial_force = (radial_factor*power*1000)/speed*60
+        self.deflection = self.tool.get_deflections(docs, radial_force)
+        return self.deflection
+
+    def get(self, name):
+        """
+        Returns the map for the given quantity, with unreachable cells
+        set to NaN.
+        """
+        if name not in self.quantities:
+            raise AttributeError(f"unknown quantity {name}")
+        values = getattr(self, name)
+        if values is None:
+            raise AttributeError(f"{name} was not calculated")
+        return np.where(self.valid, values, np.nan)
+
+    def to_array(self):
+        """
+        Returns a 3D array indexed [quantity, doc, woc] containing all
+        calculated maps, and the list of quantity names in that order.
+        """
+        names = [n for n in self.quantities if getattr(self, n) is not None]
+        return np.stack([self.get(n) for n in names]), names
+
+    def save_csv(self, filename):
+        """
+        Writes one row per DOC/WOC pair, with one column per quantity.
+        """
+        values, names = self.to_array()
+        docs, wocs = np.meshgrid(self.docs, self.wocs, indexing='ij')
+        columns = [docs.ravel(), wocs.ravel()] + [v.ravel() for v in values]
+        np.savetxt(filename,
+                   np.column_stack(columns),
+                   delimiter=',',
+                   fmt='%.6g',
+                   header=','.join(['doc', 'woc']+names),
+                   comments='')
+
+    def save_png(self, filename, name='overlap', point=None, cmap='viridis'):
+        """
+        Renders the map for the given quantity into a PNG image, with DOC
+        increasing downwards and WOC increasing to the right. If point is
+        a (doc, woc) tuple, e.g. the result of the optimizer, it is marked
+        in red.
+        """
+        values = self.get(name)
+        finite = values[np.isfinite(values)]
+        vmin, vmax = (finite.min(), finite.max()) if finite.size else (0, 1)
+        norm = (values-vmin)/((vmax-vmin) or 1)
+        rgba = plt.get_cmap(cmap)(norm)
+        rgba[~np.isfinite(values)] = 0  # transparent
+
+        if point is not None:
+            row = np.abs(self.docs-point[0]).argmin()
+            col = np.abs(self.wocs-point[1]).argmin()
+            rgba[max(0, row-1):row+2, col] = 1, 0, 0, 1
+            rgba[row, max(0, col-1):col+2] = 1, 0, 0, 1
+
+        plt.imsave(filename, rgba)
@@ -1,5 +1,6 @@
 import math
 import inspect
+import numpy as np
 from ..i18n import translate
 from .util import get_tool_engagement_angle, get_lead_angle_deflection_factor
 
@@ -31,8 +32,8 @@ class Operation(object):
         fc.chipload.set_limit(chipload*cls.chip_multiplier)
 
     @classmethod
-    def get_overlap(cls, endmill, doc, woc):
-        pixmap = endmill.get_pixmap()
+    def get_overlap(cls, endmill, doc, woc, interpolate=False):
+        pixmap = endmill.get_pixmap(interpolate)
         return pixmap.get_overlap_from_woc(doc, woc)
 
     @classmethod
@@ -47,6 +48,22 @@ class Operation(object):
     def get_lead_angle_deflection_factors(cls, doc, woc, diameter):
         return get_lead_angle_deflection_factor(doc, woc, diameter)
 
+    @classmethod
+    def get_cut_limits(cls, endmill, material, docs, wocs, diameters):
+        """
+        Returns a tuple of arrays (max_speed, max_chipload, feed_factor)
+        with the limits that prepare() and optimize_cut() set for the
+        given DOC/WOC pairs and effective diameters, which are broadcast
+        against each other. Used for batched estimates, without running
+        the optimizer.
+        """
+        shape = np.broadcast(docs, wocs, diameters).shape
+        speed_range = endmill.get_speed_for_material(material, cls)
+        chipload = endmill.get_chipload_for_material(material)
+        return (np.full(shape, speed_range[1]*cls.speed_multiplier),
+                np.full(shape, chipload*cls.chip_multiplier),
+                np.ones(shape))
+
 class Slotting(Operation):
     speed_multiplier = 0.83 # WIDIA: 90% tooth cutting speed for slotting minus ~10% which is added back in our interpolation equation.
     chip_multiplier = 0.73 # WIDIA: 80% chipload for slotting minus ~10% which is added back in our interpolation equation.
@@ -60,7 +77,7 @@ class Slotting(Operation):
         diameter = endmill.shape.get_diameter()
 
         # In slotting, the width of cut is fixed.
-        pixmap = endmill.get_pixmap()
+        pixmap = endmill.get_pixmap(fc.interpolate)
         effective_d = pixmap.get_effective_diameter_from_doc(fc.doc.v)
         fc.effective_diameter.v = effective_d
         fc.woc.v = effective_d
@@ -77,7 +94,7 @@ class Profiling(Operation):
 
     @classmethod
     def optimize_cut(cls, fc, endmill, material):
-        pixmap = endmill.get_pixmap()
+        pixmap = endmill.get_pixmap(fc.interpolate)
         effective_d = pixmap.get_effective_diameter_from_doc(fc.doc.v)
         fc.effective_diameter.v = effective_d
         fc.woc.set_limit(effective_d)
@@ -96,13 +113,12 @@ class HSM(Operation):
 
     @classmethod
     def optimize_cut(cls, fc, endmill, material):
-        pixmap = endmill.get_pixmap()
+        pixmap = endmill.get_pixmap(fc.interpolate)
         effective_d = pixmap.get_effective_diameter_from_doc(fc.doc.v)
         fc.effective_diameter.v = effective_d
         fc.woc.set_limit(effective_d)
 
         # Tool Engagement Angle (straight shoulder along a straight path)
-        doc = max(0.00001, fc.doc.v)
         woc = max(0.00001, fc.woc.v)
         fc.engagement_angle.v = get_tool_engagement_angle(woc, effective_d)
 
@@ -114,11 +130,44 @@ class HSM(Operation):
         # - Adjust WOC and feed
         #woc, feed = interpolate_helical(HELICAL.v, DIAMETER.v, WOC.v)
 
+        speed_factor, chip_factor, feed_factor = cls._get_cut_factors(
+            endmill, fc.doc.v, fc.woc.v, effective_d)
+        fc.speed_factor.v = float(speed_factor)
+        fc.chip_factor.v = float(chip_factor)
+        fc.feed_factor.v = float(feed_factor)
+        speed_range = endmill.get_speed_for_material(material, Profiling)
+        fc.speed.set_limit(speed_range[1]*fc.speed_factor.v)
+        chipload = endmill.get_chipload_for_material(material)
+        fc.chipload.set_limit(chipload*fc.chip_factor.v)
+
+    @classmethod
+    def get_cut_limits(cls, endmill, material, docs, wocs, diameters):
+        # Array version of the limits set by optimize_cut().
+        docs, wocs, diameters = np.broadcast_arrays(np.asarray(docs, dtype=float),
+                                                    np.asarray(wocs, dtype=float),
+                                                    np.asarray(diameters, dtype=float))
+        speed_factor, chip_factor, feed_factor = cls._get_cut_factors(
+            endmill, docs, wocs, diameters)
+        speed_range = endmill.get_speed_for_material(material, Profiling)
+        chipload = endmill.get_chipload_for_material(material)
+        return (speed_range[1]*speed_factor,
+                chipload*chip_factor,
+                feed_factor)
+
+    @classmethod
+    def _get_cut_factors(cls, endmill, docs, wocs, diameters):
+        """
+        Returns a tuple (speed_factor, chip_factor, feed_factor) for the
+        given DOC, WOC and effective diameter. Takes scalars or arrays.
+        """
+        docs = np.maximum(0.00001, docs)
+        wocs = np.maximum(0.00001, wocs)
+
         # Adjust chipload based on how thin the chips are.
         # WIDIA -- This is an approximation of average chip thickness. Nice
         # because it is 1.0 at full-slot, and valid through the entire range.
-        radial_engagement = woc/effective_d # SANDVIK
-        radial_chip_thinning_factor = 1/math.sqrt(radial_engagement)
+        radial_engagement = wocs/diameters # SANDVIK
+        radial_chip_thinning_factor = 1/np.sqrt(radial_engagement)
 
         """
         WIDIA: Speed & Chipload Multipliers for HSM
@@ -149,33 +198,35 @@ class HSM(Operation):
         # Equations designed by Bryan Turner (based on WIDIA suggested multipliers for Speed & Chipload)
         # WIDIA: Speed & Chipload Multipliers for HSM
         # TODO: check the curves resulting from these functions
-        fc.speed_factor.v = Slotting.speed_multiplier \
+        speed_factor = Slotting.speed_multiplier \
             + (cls.speed_multiplier-Slotting.speed_multiplier)/(radial_engagement*50)
-
-        fc.chip_factor.v = Slotting.chip_multiplier \
+        chip_factor = Slotting.chip_multiplier \
             + (cls.chip_multiplier-Slotting.chip_multiplier)/(radial_engagement*50)
-    
+
         # Axial chip thinning: Use DOC & corner-radius
         endmill_corner = endmill.shape.get_corner_radius()
         endmill_angle = endmill.shape.get_cutting_edge_angle()/2
-        if endmill_corner and endmill_corner > 0 and doc < endmill_corner:
-            # TODO: This factor is for BALLNOSE end mills -- check that it is valid for corner-rounded end mills.
-            axial_chip_thinning_factor = 1 / math.sqrt(1 - math.pow(1 - (doc/endmill_corner), 2))
-
-        elif endmill_angle and endmill_angle != 90:
+        if endmill_angle and endmill_angle != 90:
             # Endmill angle is the angle between the workpiece and the cutting edge.
             # (flutes parallel to axis = 90-degree lead)
             axial_chip_thinning_factor = 1 / (math.cos(math.radians(endmill_angle)) \
                                             * math.tan(math.radians(endmill_angle)))
-
         else:
             axial_chip_thinning_factor = 1
 
-        fc.feed_factor.v = axial_chip_thinning_factor*radial_chip_thinning_factor
-        speed_range = endmill.get_speed_for_material(material, Profiling)
-        fc.speed.set_limit(speed_range[1]*fc.speed_factor.v)
-        chipload = endmill.get_chipload_for_material(material)
-        fc.chipload.set_limit(chipload*fc.chip_factor.v)
+        if endmill_corner and endmill_corner > 0:
+            # Where the DOC is within the corner radius, the corner wins
+            # over the lead angle.
+            # TODO: This factor is for BALLNOSE end mills -- check that it is valid for corner-rounded end mills.
+            in_corner = np.minimum(docs, endmill_corner)
+            corner_factor = 1/np.sqrt(1-(1-in_corner/endmill_corner)**2)
+            axial_chip_thinning_factor = np.where(docs < endmill_corner,
+                                                  corner_factor,
+                                                  axial_chip_thinning_factor)
+
+        return (speed_factor,
+                chip_factor,
+                axial_chip_thinning_factor*radial_chip_thinning_factor)
 
 class Drilling(Operation):
     @classmethod
@@ -202,7 +253,7 @@ class Drilling(Operation):
         fc.engagement_angle.set_limit(360)
 
     @classmethod
-    def get_overlap(cls, endmill, doc, woc):
+    def get_overlap(cls, endmill, doc, woc, interpolate=False):
         return math.pi*math.pow(endmill.shape.get_diameter()/2, 2)
 
     @classmethod
@@ -0,0 +1,111 @@
+import numpy as np
+
+# The objectives of the multi-objective mode, as (param name, maximize).
+objectives = (
+    ('mrr', True),
+    ('deflection', False),
+    ('spindle_load', False),
+    ('radial_force', False),
+)
+
+class EvaluationArchive(object):
+    """
+    Collects the input point and the objective values of every valid
+    point that the optimizer evaluates, so that the Pareto front can be
+    computed after a calculation without additional evaluations.
+    """
+    def __init__(self):
+        self.points = []
+        self.values = []
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, fc, point):
+        self.points.append(tuple(point))
+        self.values.append(tuple(getattr(fc, name).v for name, _ in objectives))
+
+    def get_front(self):
+        """
+        Returns a list of (point, values) tuples for the non-dominated
+        points, sorted by MRR in descending order.
+        """
+        if not self.points:
+            return []
+        values = np.array(self.values, dtype=float)
+        front = get_pareto_front(values, [maximize for _, maximize in objectives])
+        front = front[np.argsort(-values[front, 0], kind='stable')]
+        return [(self.points[i], self.values[i]) for i in front]
+
+def get_pareto_front(values, maximize, chunk_size=512):
+    """
+    Returns the indices of the non-dominated rows of the given (n, m)
+    array, where each column is an objective. maximize is a list of m
+    booleans telling whether larger values are better for each column.
+    Of identical rows, only the first is returned.
+    """
+    values = np.asarray(values, dtype=float)
+    signs = np.where(maximize, -1.0, 1.0)
+    costs = values*signs  # Lower is better in all columns.
+
+    # Removing duplicates first means that "dominates" can be checked as
+    # "no worse in all objectives".
+    costs, first = np.unique(costs, axis=0, return_index=True)
+
+    # Sorting by the sum of all costs ensures that a point can only be
+    # dominated by points before it. Only the current front needs to be
+    # compared against, and it is checked in chunks to limit the memory
+    # of the (chunk, front, m) comparison.
+    order = np.argsort(costs.sum(axis=1), kind='stable')
+    costs, first = costs[order], first[order]
+    front = np.zeros(len(costs), dtype=bool)
+    for start in range(0, len(costs), chunk_size):
+        chunk = costs[start:start+chunk_size]
+        dominated = np.zeros(len(chunk), dtype=bool)
+        if front.any():
+            others = costs[front]
+            dominated = (others[None,:,:] <= chunk[:,None,:]).all(axis=2).any(axis=1)
+
+        # Points within the chunk may also dominate each other.
+        candidates = np.flatnonzero(~dominated)
+        for i in candidates:
+            before = chunk[candidates[candidates < i]]
+            if before.size and (before <= chunk[i]).all(axis=1).any():
+                dominated[i] = True
+            else:
+                front[start+i] = True
+
+    return np.sort(first[front])
+
+def get_choices(front):
+    """
+    Picks three results from the given Pareto front, which is a list of
+    (point, values) tuples as returned by EvaluationArchive.get_front().
+    Returns a dict mapping 'conservative', 'balanced' and 'aggressive'
+    to an index into the front, or an empty dict if the front is empty.
+
+    - aggressive: The highest MRR.
+    - balanced: The lowest risk with at least 2/3 of the highest MRR.
+    - conservative: The lowest risk with at least 1/3 of the highest MRR.
+
+    The risk is the average of the deflection, spindle load and radial
+    force, each scaled to the range of the front. A minimum MRR is
+    required because the front always extends down to a barely cutting
+    tool, which has the lowest risk of all.
+    """
+    if not front:
+        return {}
+    values = np.array([v for _, v in front], dtype=float)
+    lo, hi = values.min(axis=0), values.max(axis=0)
+    scaled = (values-lo)/np.where(hi > lo, hi-lo, 1)
+    risk = scaled[:,1:].mean(axis=1)
+    mrr = values[:,0]
+
+    def get_safest(min_mrr):
+        return int(np.argmin(np.where(mrr >= mrr.max()*min_mrr, risk, np.inf)))
+
+    return {
+        'conservative': get_safest(1/3),
+        'balanced': get_safest(2/3),
+        'aggressive': int(np.argmax(mrr)),
+    }
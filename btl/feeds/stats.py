@@ -0,0 +1,68 @@
+class FeedCalcStats(object):
+    """
+    Counters and timers collected by FeedCalc while calculating. All
+    times are in seconds.
+    """
+    timer_names = (
+        'optimize_cut',  # Operation.optimize_cut()
+        'overlap',       # Overlap lookups in the tool pixmap
+        'deflection',    # Deflection and tool strength limits
+        'validate',      # Constraint checks
+        'scipy',         # Time spent in the optimizer itself, excluding
+                         # the evaluation of points
+        'total',
+    )
+
+    def __init__(self):
+        self.timers = dict.fromkeys(self.timer_names, 0.0)
+        self.evaluations = []  # Number of evaluated points per restart
+        self.successful_restarts = 0
+
+    def add_time(self, name, seconds):
+        self.timers[name] += seconds
+
+    def start_restart(self):
+        self.evaluations.append(0)
+
+    def count_evaluation(self):
+        if not self.evaluations:
+            self.start_restart()
+        self.evaluations[-1] += 1
+
+    def get_restarts(self):
+        return len(self.evaluations)
+
+    def get_total_evaluations(self):
+        return sum(self.evaluations)
+
+    def get_success_rate(self):
+        """
+        Returns the fraction of restarts that produced a valid result.
+        """
+        restarts = self.get_restarts()
+        return self.successful_restarts/restarts if restarts else 0
+
+    def to_dict(self):
+        return {
+            'restarts': self.get_restarts(),
+            'successful_restarts': self.successful_restarts,
+            'success_rate': self.get_success_rate(),
+            'evaluations': self.get_total_evaluations(),
+            'evaluations_per_restart': list(self.evaluations),
+            'timers': dict(self.timers),
+        }
+
+    def dump(self):
+        restarts = self.get_restarts()
+        evaluations = self.get_total_evaluations()
+        print("Calculation statistics:")
+        print(f"  Restarts: {restarts} ({self.get_success_rate()*100:.0f}% successful)")
+        print(f"  Evaluations: {evaluations}"
+              f" ({evaluations/max(1, restarts):.1f} per restart,"
+              f" min {min(self.evaluations, default=0)},"
+              f" max {max(self.evaluations, default=0)})")
+        total = self.timers['total']
+        for name in self.timer_names:
+            seconds = self.timers[name]
+            percent = seconds/total*100 if total else 0
+            print(f"  {name: <14}: {seconds:.4f}s ({percent:.1f}%)")
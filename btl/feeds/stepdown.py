@@ -0,0 +1,219 @@
+import math
+import numpy as np
+from . import operation
+from .calc import FeedCalc
+from .util import get_lead_angle_deflection_factors
+
+class StepdownPlan(object):
+    """
+    The result of StepdownPlanner.plan() for one number of passes.
+    """
+    def __init__(self, passes, doc, woc, radial_steps, time, error, params):
+        self.passes = passes             # Number of axial passes
+        self.doc = doc                   # mm per pass
+        self.woc = woc                   # mm per radial step
+        self.radial_steps = radial_steps # Radial steps per pass
+        self.time = time                 # min
+        self.error = error               # None if the plan is valid
+        self.params = params             # The FeedCalc result, or None for estimates
+
+    def is_valid(self):
+        return self.error is None
+
+    def dump(self):
+        if not self.is_valid():
+            print(f"{self.passes} passes at DOC {self.doc:.3f} mm: {self.error}")
+            return
+        print(f"{self.passes} passes at DOC {self.doc:.3f} mm,"
+              f" {self.radial_steps:.2f} x WOC {self.woc:.3f} mm:"
+              f" {self.time:.2f} min")
+
+class StepdownPlanner(object):
+    """
+    Chooses the number of axial passes, and the DOC and WOC per pass, that
+    minimize the total machining time for a cut of a given depth (e.g. a
+    pocket depth or wall height).
+
+    A full FeedCalc run per candidate DOC is expensive, so the planner
+    works in two stages:
+
+    - estimate() scores all candidate pass splits at once: for every DOC,
+      a grid of WOCs is evaluated with NumPy at the highest speed and
+      chipload that the operation allows, scaled down to the power,
+      torque, feed, deflection and bend limits that FeedCalc uses.
+    - plan() runs FeedCalc, with the DOC fixed, only for the best few
+      estimates. These results are cached by DOC, so repeated plans with
+      the same (or evenly dividing) depths are free.
+    """
+    def __init__(self,
+                 machine,
+                 tool,
+                 material,
+                 op=operation.Profiling,
+                 iterations=10,
+                 pass_overhead=0,   # min of retract/plunge time per pass
+                 refine=3,          # Estimates that are verified with FeedCalc
+                 woc_steps=50,      # WOCs per DOC in estimate()
+                 interpolate=False): # See FeedCalc
+        if op not in (operation.Profiling, operation.HSM):
+            raise AttributeError(f"operation {op.label()} is not supported by the planner")
+        self.machine = machine
+        self.tool = tool
+        self.material = material
+        self.op = op
+        self.iterations = iterations
+        self.pass_overhead = pass_overhead
+        self.refine = refine
+        self.woc_steps = woc_steps
+        self.interpolate = interpolate
+        self.results = {}  # Maps DOC to the FeedCalc result
+
+    def get_result(self, doc):
+        """
+        Returns the FeedCalc result (error, params) for the given DOC in mm.
+        """
+        doc = round(doc, 4)
+        result = self.results.get(doc)
+        if result is not None:
+            return result
+
+        fc = FeedCalc(self.machine, self.tool, self.material, op=self.op,
+                      interpolate=self.interpolate)
+        fc.doc.min = doc
+        fc.doc.max = doc
+        result = self.results[doc] = fc.start(iterations=self.iterations)
+        return result
+
+    def _get_radial_steps(self, woc, stock):
+        # Adaptive toolpaths can use any stepover, but a profile needs a
+        # whole number of radial steps. Reducing the WOC to split the stock
+        # evenly does not increase the load on the tool.
+        # Works on scalars and NumPy arrays alike.
+        if stock is None:
+            return 1, woc
+        if self.op is operation.HSM:
+            return stock/woc, woc
+        radial_steps = np.ceil(stock/woc-0.000001)
+        return radial_steps, stock/radial_steps
+
+    def _get_plan(self, passes, depth, stock, length):
+        doc = depth/passes
+        error, params = self.get_result(doc)
+        woc = params['woc'].v
+        if error is not None:
+            return StepdownPlan(passes, doc, woc, 0, math.inf, error, params)
+
+        radial_steps, woc = self._get_radial_steps(woc, stock)
+        feed = params['feed'].value('mm/min')
+        time = passes*(radial_steps*length/feed+self.pass_overhead)
+        return StepdownPlan(passes, doc, woc, radial_steps, time, None, params)
+
+    def _get_pass_range(self, depth, max_passes):
+        stickout = self.tool.get_stickout()
+        cutting_edge = self.tool.shape.get_cutting_edge() or stickout
+        min_passes = math.ceil(depth/cutting_edge-0.000001)
+        return min_passes, max_passes or min_passes+10
+
+    def _get_feeds(self, docs, wocs):
+        """
+        Returns an array with the highest valid feed in mm/min for each
+        of the given DOC/WOC pairs (2D arrays indexed [doc, woc]), or NaN
+        where no valid cut was found. Uses the same equations as
+        FeedCalc.update().
+        """
+        fc = FeedCalc(self.machine, self.tool, self.material, op=self.op,
+                      interpolate=self.interpolate)
+        pixmap = self.tool.get_pixmap(self.interpolate)
+        diameters = pixmap.get_effective_diameters_from_docs(docs[:, 0])[:, np.newaxis]
+        overlap = pixmap.get_overlaps_from_wocs(docs, wocs)
+        max_speed, max_chipload, feed_factor = self.op.get_cut_limits(
+            self.tool, self.material, docs, wocs, diameters)
+
+        # Run at the highest speed that the spindle allows.
+        max_speed = np.minimum(max_speed, fc.speed.max)
+        max_rpm = max_speed*1000/(diameters*math.pi)
+        rpm = np.minimum(max_rpm, fc.rpm.max)
+        speed = rpm*diameters*math.pi/1000
+
+        # At a given speed, the feed, power, torque, forces and deflection
+        # all grow linearly with the chipload. So compute them at the
+        # highest chipload, then scale the chipload down to the tightest
+        # limit.
+        feed = max_chipload*feed_factor*self.tool.shape.get_flutes()*rpm
+        power = feed*overlap/1000*self.material.power_factor
+        torque = (power*60000)/(2*math.pi*rpm)
+        radial_factor, _ = get_lead_angle_deflection_factors(docs, wocs, diameters)
+        radial_force = (radial_factor*power*1000)/speed*60
+        deflection = self.tool.get_deflections(docs, radial_force)
+        max_deflection = self.tool.get_max_deflections(power/speed)
+        max_torque = np.minimum(self.machine.get_torque_at_rpm(rpm),
+                                min(fc.torque.max, self.tool.get_twist_limit()))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.minimum.reduce([
+                np.ones(docs.shape),
+                fc.feed.max/feed,
+                np.minimum(self.machine.get_power_at_rpm(rpm), fc.power.max)/power,
+                max_torque/torque,
+                fc.deflection.max/deflection,
+                fc.max_deflection.max/max_deflection,
+                self.tool.get_bend_limits(docs)/radial_force,
+            ])
+        feed = feed*scale
+
+        valid = (wocs <= diameters) \
+              & (rpm >= fc.rpm.min) \
+              & (feed >= fc.feed.min) \
+              & (max_chipload*scale >= fc.chipload.min)
+        return np.where(valid, feed, np.nan)
+
+    def estimate(self, depth, stock=None, length=1000, max_passes=None):
+        """
+        Like plan(), but only estimates the plans in one batched
+        evaluation, without running FeedCalc. The params of the returned
+        plans are None. See plan() for the arguments.
+        """
+        min_passes, max_passes = self._get_pass_range(depth, max_passes)
+        passes = np.arange(min_passes, max_passes+1)
+        docs = depth/passes
+
+        diameters = self.tool.get_pixmap(self.interpolate).get_effective_diameters_from_docs(docs)
+        fractions = np.linspace(1/self.woc_steps, 1, self.woc_steps)
+        wocs = diameters[:, np.newaxis]*fractions
+        docs = np.repeat(docs[:, np.newaxis], self.woc_steps, axis=1)
+        feeds = self._get_feeds(docs, wocs)
+
+        radial_steps, wocs = self._get_radial_steps(wocs, stock)
+        times = passes[:, np.newaxis]*(radial_steps*length/feeds+self.pass_overhead)
+        times = np.where(np.isnan(times), math.inf, times)
+
+        plans = []
+        for i, n in enumerate(passes):
+            j = np.argmin(times[i])
+            steps = radial_steps if stock is None else radial_steps[i, j]
+            if math.isinf(times[i, j]):
+                plan = StepdownPlan(int(n), docs[i, j], 0, 0, math.inf,
+                                    'no valid cut found', None)
+            else:
+                plan = StepdownPlan(int(n), docs[i, j], wocs[i, j], steps,
+                                    times[i, j], None, None)
+            plans.append(plan)
+        return sorted(plans, key=lambda p: p.time)
+
+    def plan(self, depth, stock=None, length=1000, max_passes=None):
+        """
+        Returns a list of StepdownPlans, sorted by machining time, so that
+        the first one is the best. Only the best estimates (see
+        estimate()) are calculated with FeedCalc and returned.
+
+        depth: Total depth of the cut in mm
+        stock: Width of the material to remove in mm. If None, each pass
+               is a single cut at the calculated WOC.
+        length: Length of the tool path per radial step in mm
+        max_passes: The largest number of passes to consider. Defaults to
+               ten more than the fewest possible.
+        """
+        estimates = self.estimate(depth, stock, length, max_passes)
+        plans = [self._get_plan(e.passes, depth, stock, length)
+                 for e in estimates[:self.refine]]
+        return sorted(plans, key=lambda p: p.time)
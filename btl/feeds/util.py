@@ -1,9 +1,19 @@
 import math
+import numpy as np
 
 def get_tool_engagement_angle(woc, diameter):
     # SANDVIK - http://www.sandvik.coromant.com/en-us/knowledge/milling/formulas_and_definitions/formulas/pages/default.aspx
     return math.degrees(math.acos(1-((2*min(woc, diameter))/diameter)))
 
+def get_tool_engagement_angles(wocs, diameters):
+    """
+    Like get_tool_engagement_angle(), but accepts arrays (or scalars) that
+    are broadcast against each other. Returns an array of angles in degrees.
+    """
+    wocs = np.asarray(wocs, dtype=float)
+    diameters = np.asarray(diameters, dtype=float)
+    return np.degrees(np.arccos(1-((2*np.minimum(wocs, diameters))/diameters)))
+
 def get_lead_angle_deflection_factor(doc, woc, diameter, helix_angle=30): 
     """
     Returns a tuple of factors (radial, axial) to apply for lead angle
@@ -34,6 +44,27 @@ def get_lead_angle_deflection_factor(doc, woc, diameter, helix_angle=30):
 
     return radialFactor, 1-radialFactor
 
+def get_lead_angle_deflection_factors(docs, wocs, diameters, helix_angle=30):
+    """
+    Like get_lead_angle_deflection_factor(), but accepts arrays (or scalars)
+    that are broadcast against each other. Returns a tuple of arrays
+    (radial, axial).
+    """
+    docs, wocs, diameters = np.broadcast_arrays(np.asarray(docs, dtype=float),
+                                                np.asarray(wocs, dtype=float),
+                                                np.asarray(diameters, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        radial = np.minimum(1,
+                            np.cos(np.arctan(np.minimum(wocs, diameters/2)/docs))
+                          * np.sqrt(wocs/diameters)
+                          * math.cos(math.radians(helix_angle)))
+    radial = np.where((wocs < 0) | (docs < 0), 1, radial)
+    axial = np.where((wocs < 0) | (docs < 0), 1, 1-radial)
+    return radial, axial
+
+# The cantilever functions accept scalars as well as NumPy arrays, which
+# are broadcast against each other.
+
 def cantilever_deflect_endload(force, length, elasticity, inertia):
     """
     force: N
@@ -43,7 +74,7 @@ def cantilever_deflect_endload(force, length, elasticity, inertia):
 
     returns deflection in mm
     """
-    return force * math.pow(length, 3) / (3*elasticity*inertia)
+    return force * length**3 / (3*elasticity*inertia)
 
 def cantilever_deflect_uniload(force, length, elasticity, inertia):
     """
@@ -54,4 +85,5 @@ def cantilever_deflect_uniload(force, length, elasticity, inertia):
 
     returns deflection in mm
     """
-    return (force/length) * math.pow(length, 4) / (8*elasticity*inertia)
+    # Total force spread over the length: (force/length) * length⁴
+    return force * length**3 / (8*elasticity*inertia)
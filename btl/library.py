@@ -9,6 +9,7 @@ class Library(object):
         self.label = label
         self.tools = []
         self.tool_nos = {}  # Maps tool_no number to tool
+        self.pockets = {}  # Maps tool id to pocket
 
     def __str__(self):
         return '{} "{}"'.format(self.id, self.label)
@@ -19,6 +20,16 @@ class Library(object):
     def __iter__(self):
         return self.tools.__iter__()
 
+    def get_state(self):
+        """
+        Returns a value that compares unequal to an earlier result if
+        anything about the library that is serialized was changed since.
+        The tools themselves are not included, see Tool.get_state().
+        """
+        return (self.label,
+                tuple(sorted((no, t.id, self.pockets.get(t.id))
+                             for no, t in self.tool_nos.items())))
+
     def get_next_tool_no(self):
         tool_nolist = sorted(self.tool_nos, reverse=True)
         return tool_nolist[0]+1 if tool_nolist else 1
@@ -29,6 +40,17 @@ class Library(object):
                 return tool_no
         return None
 
+    def get_pocket(self, tool):
+        return self.pockets.get(tool.id)
+
+    def set_pocket(self, tool, pocket):
+        # The pocket depends on the library, as tools are shared between
+        # libraries.
+        if pocket:
+            self.pockets[tool.id] = pocket
+        else:
+            self.pockets.pop(tool.id, None)
+
     def assign_new_tool_no(self, tool, tool_no=None):
         if tool not in self.tools:
             return
@@ -68,6 +90,7 @@ class Library(object):
     def remove_tool(self, tool):
         self.tools = [t for t in self.tools if t.id != tool.id]
         self.tool_nos = {k: v for (k, v) in self.tool_nos.items() if v != tool}
+        self.pockets.pop(tool.id, None)
 
     def serialize(self, serializer, filename=None):
         return serializer.serialize_library(self, filename=filename)
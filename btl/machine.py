@@ -1,5 +1,7 @@
 import math
 import uuid
+from bisect import bisect_right
+import numpy as np
 from . import const
 from .params import Param, IntParam, FloatParam
 
@@ -13,21 +15,26 @@ class Machine(object):
                  peak_torque_rpm=None, # IntParam or RPM (int)
                  min_feed=1,           # FloatParam or mm/min (float)
                  max_feed=2000,        # FloatParam or mm/min (float)
+                 torque_curve=None,    # list of (RPM, Nm) tuples
                  id=None):
         self.id = id or str(uuid.uuid1())
         self.label = label
         self.max_power = FloatParam.from_value('max_power', max_power, 'kW')
         self.min_rpm = IntParam.from_value('min_rpm', min_rpm)
         self.max_rpm = IntParam.from_value('max_rpm', max_rpm)
+        self.set_torque_curve(torque_curve)
+        if peak_torque_rpm is None and self.torque_curve:
+            peak_torque_rpm = max(self.torque_curve, key=lambda p: p[1])[0]
         ptr = peak_torque_rpm or self.max_rpm.v/3
         self.peak_torque_rpm = IntParam.from_value('peak_torque_rpm', ptr) # RPM at which we reach peak Torque
         self.min_feed = FloatParam.from_value('min_feed', min_feed, 'mm/min')
         self.max_feed = FloatParam.from_value('max_feed', max_feed, 'mm/min')
 
-        # TODO: More advanced torque curve: lookup table with linear approximation between entries
         if isinstance(max_torque, Param):
             self.max_torque = max_torque
         else:
+            if max_torque is None and self.torque_curve:
+                max_torque = max(t for rpm, t in self.torque_curve)
             max_power = self.max_power.value('kW')
             max_torque = max_torque or max_power*9548.8/self.peak_torque_rpm.v
             self.max_torque = FloatParam.from_value('max_torque', max_torque, 'Nm')
@@ -43,11 +50,80 @@ class Machine(object):
             raise AttributeError('Max RPM must be larger than min RPM')
         if self.max_feed <= self.min_feed:
             raise AttributeError('Max feed must be larger than min feed')
+        if self.torque_curve:
+            if len(self.torque_curve) < 2:
+                raise AttributeError('Torque curve needs at least two points')
+            rpms = [rpm for rpm, torque in self.torque_curve]
+            if len(set(rpms)) != len(rpms):
+                raise AttributeError('Torque curve has duplicate RPM entries')
+            if any(torque < 0 for rpm, torque in self.torque_curve):
+                raise AttributeError('Torque curve has negative torque')
+
+    def set_torque_curve(self, points):
+        """
+        Sets the spindle torque curve from a list of (rpm, torque) tuples,
+        where torque is in Nm. Between the points, torque is interpolated
+        linearly. Below the first and above the last point, the torque of
+        that point is used.
+        Passing None (or an empty list) restores the default curve, which
+        is a linear ramp up to max_torque at peak_torque_rpm.
+        """
+        self.torque_curve = sorted((rpm, float(torque))
+                                   for rpm, torque in points or [])
+
+        # Precompute the lookup tables, so that evaluating the curve
+        # is no more expensive than the default formula.
+        self._curve_rpms = [rpm for rpm, torque in self.torque_curve]
+        self._curve_torques = [torque for rpm, torque in self.torque_curve]
+        self._curve_slopes = [(t1-t0)/(r1-r0) if r1 != r0 else 0
+                              for (r0, t0), (r1, t1)
+                              in zip(self.torque_curve, self.torque_curve[1:])]
+
+    def get_torque_curve(self):
+        return self.torque_curve
 
     def get_torque_at_rpm(self, rpm):
-        # TODO: More advanced torque curve: lookup table with linear approximation between entries
-        max_torque = self.max_torque.value('Nm')
-        return min(max_torque, max_torque/self.peak_torque_rpm.v*rpm)
+        """
+        Returns the available torque in Nm at the given RPM. rpm may
+        also be an array, in which case an array is returned.
+        """
+        if np.ndim(rpm):
+            if self.torque_curve:
+                return np.interp(rpm, self._curve_rpms, self._curve_torques)
+            max_torque = self.max_torque.value('Nm')
+            return np.minimum(max_torque, max_torque/self.peak_torque_rpm.v*np.asarray(rpm))
+
+        if not self.torque_curve:
+            max_torque = self.max_torque.value('Nm')
+            return min(max_torque, max_torque/self.peak_torque_rpm.v*rpm)
+
+        index = bisect_right(self._curve_rpms, rpm)-1
+        if index < 0:
+            return self._curve_torques[0]
+        if index >= len(self._curve_slopes):
+            return self._curve_torques[-1]
+        return self._curve_torques[index] \
+             + self._curve_slopes[index]*(rpm-self._curve_rpms[index])
+
+    def get_power_at_rpm(self, rpm):
+        """
+        Returns the available power in kW at the given RPM, as limited by
+        both the torque curve and max_power. rpm may also be an array.
+        """
+        power = self.get_torque_at_rpm(rpm)*2*math.pi*np.asarray(rpm)/60000
+        power = np.minimum(power, self.max_power.value('kW'))
+        return power if np.ndim(rpm) else float(power)
+
+    def get_state(self):
+        """
+        Returns a value that compares unequal to an earlier result if
+        anything about the machine that is serialized was changed since.
+        """
+        params = (self.max_power, self.max_torque, self.peak_torque_rpm,
+                  self.min_rpm, self.max_rpm, self.min_feed, self.max_feed)
+        return (self.label,
+                tuple((p.v, p.unit) for p in params),
+                tuple(self.torque_curve))
 
     def set_label(self, label):
         self.label = label
@@ -95,3 +171,5 @@ class Machine(object):
         print(f"  RPM: {self.min_rpm} rpm - {self.max_rpm} rpm")
         print(f"  Feed: {self.min_feed.format()} - {self.max_feed.format()}")
         print(f"  Peak torque: {self.max_torque.format()} at {self.peak_torque_rpm} rpm")
+        for rpm, torque in self.torque_curve:
+            print(f"    {torque} Nm at {rpm} rpm")
@@ -1,22 +1,80 @@
 import re
 import random
+from copy import deepcopy
 from .units import convert, get_default_unit_conversion, parse_value
 
+# Labels are derived from param names, of which there are few distinct
+# ones. Cache them so that each label is only computed once.
+_labels = {}
+
+def _label_from_name(name):
+    label = _labels.get(name)
+    if label is None:
+        label = re.sub(r'([A-Z])', r' \1', name).strip().capitalize()
+        _labels[name] = label
+    return label
+
+# Maps each Param class to the names of all of its slots.
+_slot_names = {}
+
+def _get_slot_names(cls):
+    names = _slot_names.get(cls)
+    if names is None:
+        names = tuple(name
+                      for klass in cls.__mro__
+                      for name in getattr(klass, '__slots__', ()))
+        _slot_names[cls] = names
+    return names
+
 class Param(object):
-    name = None
-    label = None
-    unit = ''
+    # Many thousand params may exist at once (one per shape property and
+    # attribute of every tool, plus the FeedCalc params), so they use
+    # slots instead of a per-instance __dict__.
+    # Subclasses must define __slots__ as well, even if empty.
+    __slots__ = 'name', '_label', 'unit', 'v', 'group', 'choices'
+    default_unit = ''
     fmt = '{}'
     type = str
-    choices = None
-    group = None
 
     def __init__(self, name=None, unit=None, v=None):
-        label = re.sub(r'([A-Z])', r' \1', name or '').strip().capitalize()
-        self.name = self.name if name is None else name
-        self.label = self.label if name is None else label
-        self.unit = self.unit if unit is None else unit
+        self.name = name
+        self._label = None
+        self.unit = self.default_unit if unit is None else unit
         self.v = v
+        self.group = None
+        self.choices = None
+
+    @property
+    def label(self):
+        if self._label is None and self.name is not None:
+            return _label_from_name(self.name)
+        return self._label
+
+    @label.setter
+    def label(self, label):
+        self._label = label
+
+    def copy(self):
+        """
+        Returns a copy of the param. The choices, and values that are
+        lists, are copied as well; all other attributes are immutable, so
+        this is also what deepcopy() returns.
+        """
+        cls = self.__class__
+        param = cls.__new__(cls)
+        for name in _get_slot_names(cls):
+            setattr(param, name, getattr(self, name))
+        if param.choices is not None:
+            param.choices = list(param.choices)
+        if isinstance(param.v, list):
+            param.v = deepcopy(param.v)
+        return param
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
 
     @classmethod
     def from_value(cls, name, value, default_unit=None):
@@ -58,9 +116,12 @@ class Param(object):
         print(self.to_dict())
 
 class BoolParam(Param):
+    __slots__ = ()
     type = bool
 
 class NumericParam(Param):
+    __slots__ = 'decimals', 'min', 'max', 'limit'
+
     def __init__(self,
                  min=None,
                  max=None,
@@ -147,9 +208,9 @@ class NumericParam(Param):
             value += self.unit
         return value
 
-    def assign_random(self):
+    def assign_random(self, rng=random):
         limit = min(self.max, self.limit)
-        self.v = random.uniform(self.min, limit)
+        self.v = rng.uniform(self.min, limit)
 
     def set_limit(self, limit):
         self.limit = min(self.max, limit)
@@ -196,9 +257,11 @@ class NumericParam(Param):
         return f"{value} ({percent:.0f}%) (min {min_value}, max {max_value}, limit {limit})"
 
 class IntParam(NumericParam):
+    __slots__ = ()
     type = int
 
 class FloatParam(NumericParam):
+    __slots__ = ()
     type = float
 
     def __init__(self,
@@ -216,11 +279,13 @@ class FloatParam(NumericParam):
                                          decimals=decimals)
 
 class DistanceParam(FloatParam):
-    unit = 'mm'
+    __slots__ = ()
+    default_unit = 'mm'
     fmt = '{}'
 
 class AngleParam(FloatParam):
-    unit = '°'
+    __slots__ = ()
+    default_unit = '°'
     fmt = '{}'
 
 type_map = {
@@ -229,3 +294,42 @@ type_map = {
    float: FloatParam,
    str: Param,
 }
+
+# For storing params in a generic way, e.g. in a cache or database.
+record_types = {cls.__name__: cls for cls in (Param,
+                                              BoolParam,
+                                              IntParam,
+                                              FloatParam,
+                                              DistanceParam,
+                                              AngleParam)}
+
+def param_to_record(param):
+    """
+    Returns a JSON serializable list that contains everything needed to
+    restore the param using param_from_record().
+    """
+    record = [type(param).__name__,
+              param.name,
+              param.v,
+              param.unit,
+              param.group,
+              param.choices,
+              param._label]
+    if isinstance(param, NumericParam):
+        record += [param.min, param.max, param.limit, param.decimals]
+    return record
+
+def param_from_record(record):
+    # Records written before the label and numeric fields were added
+    # only have the first six fields; those get the defaults.
+    typename, name, v, unit, group, choices = record[:6]
+    param = record_types[typename](name=name)
+    param.v = v
+    param.unit = unit
+    param.group = group
+    param.choices = choices
+    if len(record) > 6:
+        param._label = record[6]
+    if len(record) > 7 and isinstance(param, NumericParam):
+        param.min, param.max, param.limit, param.decimals = record[7:11]
+    return param
@@ -3,6 +3,7 @@ from .fcserializer import FCSerializer
 from .linuxcncserializer import LinuxCNCSerializer
 from .fusionserializer import FusionToolsSerializer
 from .fusionserializer import FusionJSONSerializer
+from .sqliteserializer import SQLiteSerializer
 
 serializers = {
     'camotics': CamoticsSerializer,
@@ -10,4 +11,5 @@ serializers = {
     'linuxcnc': LinuxCNCSerializer,
     'fusion_tools': FusionToolsSerializer,
     'fusion_json': FusionJSONSerializer,
+    'sqlite': SQLiteSerializer,
 }
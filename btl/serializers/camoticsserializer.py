@@ -53,6 +53,10 @@ class CamoticsSerializer(Serializer):
         filename = self._library_filename_from_id(id)
         os.remove(filename)
 
+    def remove_library(self, id):
+        if os.path.exists(self._library_filename_from_id(id)):
+            self._remove_library_by_id(id)
+
     def serialize_libraries(self, libraries):
         existing = set(self._get_library_ids())
         for library in libraries:
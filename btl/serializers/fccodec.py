@@ -0,0 +1,126 @@
+from functools import lru_cache
+from ..fcutil import load_shape_properties, \
+                     shape_property_to_param, \
+                     parse_float_with_unit, \
+                     int_or_none, \
+                     float_or_none
+
+# Tools of a library tend to share values, so parsed values are cached.
+_parse_float_with_unit = lru_cache(maxsize=4096)(parse_float_with_unit)
+
+class PropertyCodec(object):
+    """
+    Converts one parameter of a tool file from and to a Param, using the
+    property of the shape file as a type hint (see tool_property_to_param()).
+    The checks that depend only on the property are done once, here.
+    """
+    def __init__(self, groupname, propname, prop, enums):
+        self.name = propname
+        self.prototype = shape_property_to_param(groupname, propname, prop, enums)
+        self.param_type = type(self.prototype)
+        self.default = getattr(prop, 'Value', None)
+        self.has_default = hasattr(prop, 'Value')
+
+        param_type = self.prototype.type
+        if issubclass(param_type, bool):
+            self.decode_value = lambda v: bool(v or False)
+        elif issubclass(param_type, int):
+            self.decode_value = int_or_none
+        elif issubclass(param_type, float) and self.prototype.unit:
+            self.decode_value = None  # Handled in decode(), as it sets the unit
+        elif issubclass(param_type, float):
+            self.decode_value = float_or_none
+        elif issubclass(param_type, str):
+            self.decode_value = lambda v: v
+        else:
+            raise NotImplementedError(
+              f'whoops - param {propname} with type {param_type} not implemented')
+
+        if isinstance(prop, bool):
+            self.encode = lambda p: 1 if p.v else 0
+        elif isinstance(prop, int):
+            self.encode = lambda p: str(p.v or 0)
+        elif isinstance(prop, (float, str)):
+            self.encode = lambda p: p.v
+        else:
+            # FIXME: this hack is used because FreeCAD writes these parameters using comma
+            # separator when run in the UI, but not when running it here. I couldn't yet
+            # figure out where this (likely locale dependent) setting is made.
+            self.encode = lambda p: str(p.v).replace('.', ',')+' '+p.unit
+
+    def decode(self, value):
+        if value is None:
+            if not self.has_default:
+                raise AttributeError(f'no value for {self.name}')
+            value = self.default
+
+        prototype = self.prototype
+        param = self.param_type(name=self.name, unit=prototype.unit)
+        param.group = prototype.group
+        if prototype.choices is not None:
+            param.choices = list(prototype.choices)
+        if self.decode_value is not None:
+            param.v = self.decode_value(value)
+        elif isinstance(value, str):
+            param.v, param.unit = _parse_float_with_unit(value, param.unit)
+        else:
+            param.v = float_or_none(value)
+        return param
+
+class ToolCodec(object):
+    """
+    Converts the "parameter" section of tool files that use the given
+    shape file. Build it using get_tool_codec(), so it is only compiled
+    once per shape file.
+    """
+    def __init__(self, properties):
+        self.codecs = []
+        self.errors = {}  # Maps property name to the error of unsupported properties
+        for groupname, propname, prop, enums in properties:
+            try:
+                codec = PropertyCodec(groupname, propname, prop, enums)
+            except (AttributeError, ValueError) as e:
+                self.errors[propname] = e
+                continue
+            self.codecs.append(codec)
+
+    def decode(self, parameters, filename):
+        """
+        Returns a list of Params for the given "parameter" dict of a tool
+        file. Parameters that are not defined by the shape are left in the
+        dict.
+        """
+        result = []
+        for propname in self.errors:
+            value = parameters.pop(propname, None)
+            print(f"Ouch! Unsupported attribute '{propname}' with value '{value}' in {filename}")
+        for codec in self.codecs:
+            value = parameters.pop(codec.name, None)
+            try:
+                result.append(codec.decode(value))
+            except (AttributeError, ValueError):
+                print(f"Ouch! Unsupported attribute '{codec.name}' with value '{value}' in {filename}")
+        return result
+
+    def encode(self, shape):
+        """
+        Returns the "parameter" dict of a tool file for the given shape.
+        """
+        result = {}
+        for codec in self.codecs:
+            param = shape.get_param(codec.name)
+            value = codec.encode(param)
+            if value is not None:
+                result[codec.name] = value
+        return result
+
+_codecs = {}  # Maps shape filename to (properties, ToolCodec)
+
+def get_tool_codec(filename):
+    properties = load_shape_properties(filename)
+    cached = _codecs.get(filename)
+    if cached and cached[0] is properties:
+        return cached[1]
+    codec = ToolCodec(properties)
+    _codecs[filename] = properties, codec
+    return codec
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+from ..params import param_to_record
+from ..util import get_file_fingerprint
+
+INDEX_FILENAME = '.btl-index.json'
+INDEX_VERSION = 3
+
+class LoadIndex(object):
+    """
+    A sidecar file in the tool directory that holds the decoded tools of
+    the last load, so that unchanged tool files do not need to be read
+    and decoded again.
+
+    A record is only used if the fingerprints (mtime, size, inode) of the
+    tool file and of its shape file still match those at the time the
+    record was made.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = {}  # Maps tool ID to a record
+        self.used = set()  # IDs of the records used or added in this load
+        self.modified = False
+        self.fingerprints = {}  # Caches shape file fingerprints during a load
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.filename, 'r') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION:
+            self.records = data.get('tools', {})
+
+    def save(self):
+        # Records of tools that were not loaded were removed.
+        if not self.modified and self.used == set(self.records):
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'tools': {id: self.records[id] for id in sorted(self.used)},
+        }
+        tmp_filename = self.filename+'.tmp'
+        try:
+            # dumps() is much faster than dump(), which does not use the C
+            # encoder.
+            with open(tmp_filename, 'w') as fp:
+                fp.write(json.dumps(data, separators=(',', ':')))
+            os.replace(tmp_filename, self.filename)
+        except OSError as e:
+            # The index is only a cache, e.g. the directory may be read-only.
+            sys.stderr.write('WARN: could not write {}: {}\n'.format(self.filename, e))
+
+    def _get_shape_fingerprint(self, filename):
+        if filename not in self.fingerprints:
+            self.fingerprints[filename] = get_file_fingerprint(filename)
+        return self.fingerprints[filename]
+
+    def get(self, id, fingerprint):
+        """
+        Returns the record for the tool with the given ID, or None if
+        there is none or it is outdated. fingerprint is the fingerprint of
+        the tool file.
+        """
+        record = self.records.get(id)
+        if record is None or fingerprint is None:
+            return None
+        if record['fingerprint'] != fingerprint:
+            return None
+        shape_fingerprint = self._get_shape_fingerprint(record['shape_file'])
+        if shape_fingerprint is None or record['shape_fingerprint'] != shape_fingerprint:
+            return None
+        self.used.add(id)
+        return record
+
+    def put(self, id, fingerprint, shape_name, tool):
+        """
+        Creates a record from the given freshly decoded tool. fingerprint
+        is the fingerprint of the tool file before it was read, and
+        shape_name the name of the shape as referenced by the tool file.
+        """
+        shape_file = tool.shape.filename
+        self.records[id] = {
+            'fingerprint': fingerprint,
+            'shape_file': shape_file,
+            'shape_fingerprint': self._get_shape_fingerprint(shape_file),
+            'label': tool.label,
+            'shape': shape_name,
+            'summary': tool.get_summary(),
+            'attrs': [param_to_record(p) for p in tool.attrs.values()],
+            'params': [param_to_record(p) for p in tool.shape.params.values()],
+        }
+        self.used.add(id)
+        self.modified = True
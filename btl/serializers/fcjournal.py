@@ -0,0 +1,269 @@
+import os
+import sys
+import glob
+import json
+from ..util import get_file_fingerprint
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+JOURNAL_FILENAME = '.btl-journal.json'
+JOURNAL_VERSION = 1
+LOCK_FILENAME = '.btl-journal.lock'
+TMP_EXT = '.btl-tmp'
+
+def _lock_file(fp):
+    if fcntl:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        return
+    fp.seek(0)
+    while True:
+        try:
+            msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # LK_LOCK gives up after 10 seconds
+
+def _unlock_file(fp):
+    if fcntl:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+        return
+    fp.seek(0)
+    msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+
+class JournalLock(object):
+    """
+    An exclusive lock on a tool directory, shared by all processes that
+    use it. A save holds it from its first temporary file until it is
+    committed, so that recovery never deletes the temporary files of a
+    save that is still running. The operating system releases it if the
+    process dies.
+    """
+    def __init__(self, path):
+        self.filename = os.path.join(path, LOCK_FILENAME)
+        self.fp = None
+
+    def acquire(self):
+        fp = open(self.filename, 'a+')
+        try:
+            _lock_file(fp)
+        except BaseException:
+            fp.close()
+            raise
+        self.fp = fp
+
+    def release(self):
+        if self.fp is None:
+            return
+        try:
+            _unlock_file(self.fp)
+        finally:
+            self.fp.close()
+            self.fp = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+def _fsync_dir(path):
+    # Makes renames in the directory durable. Not possible on Windows.
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _fsync_file(filename):
+    with open(filename, 'rb+') as fp:
+        os.fsync(fp.fileno())
+
+def _write_tmp(filename, text):
+    tmp_filename = filename+TMP_EXT
+    with open(tmp_filename, 'w') as fp:
+        fp.write(text)
+        fp.flush()
+        os.fsync(fp.fileno())
+    return tmp_filename
+
+def _write_tmp_with(filename, write_func):
+    # For files written by others, e.g. Shape.write_to_file().
+    tmp_filename = filename+TMP_EXT
+    write_func(tmp_filename)
+    _fsync_file(tmp_filename)
+    return tmp_filename
+
+def write_file_atomic(filename, text):
+    """
+    Replaces the given file, such that it is never left partially written.
+    """
+    os.replace(_write_tmp(filename, text), filename)
+    _fsync_dir(os.path.dirname(filename) or '.')
+
+def write_file_atomic_with(filename, write_func):
+    """
+    Like write_file_atomic(), but the content is written by calling
+    write_func(filename).
+    """
+    os.replace(_write_tmp_with(filename, write_func), filename)
+    _fsync_dir(os.path.dirname(filename) or '.')
+
+class WriteBatch(object):
+    """
+    Groups the file writes and removals of one save, so that either all
+    or none of them take effect, even if the process crashes.
+
+    Files are first written next to their target, with TMP_EXT appended.
+    commit() then writes a journal listing all renames and removals. Once
+    the journal exists, the save is complete; recover() finishes any
+    renames that were interrupted. Without a journal, recover() deletes
+    the temporary files, so the previous state remains.
+
+    The batch holds the JournalLock of the path until it is committed or
+    aborted. dirs are the directories that may contain temporary files;
+    they are recovered when the batch is created.
+    """
+    def __init__(self, path, dirs):
+        self.path = path
+        self.renames = []  # List of (tmp_filename, filename)
+        self.removals = []
+        self.tmp_dirs = set()  # Directories that received temporary files
+        self.lock = JournalLock(path)
+        self.lock.acquire()
+        try:
+            _recover(path, dirs)
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def write(self, filename, text):
+        self._add_rename(_write_tmp(filename, text), filename)
+
+    def write_with(self, filename, write_func):
+        self._add_rename(_write_tmp_with(filename, write_func), filename)
+
+    def _add_rename(self, tmp_filename, filename):
+        self.renames.append((tmp_filename, filename))
+        self.tmp_dirs.add(os.path.dirname(tmp_filename) or '.')
+
+    def remove(self, filename):
+        self.removals.append(filename)
+
+    def abort(self):
+        try:
+            for tmp_filename, filename in self.renames:
+                if os.path.exists(tmp_filename):
+                    os.remove(tmp_filename)
+        finally:
+            self._reset()
+
+    def commit(self):
+        try:
+            if self.renames or self.removals:
+                self._commit()
+        finally:
+            self._reset()
+
+    def _commit(self):
+        relpath = lambda f: os.path.relpath(f, self.path)
+        journal = {
+            'version': JOURNAL_VERSION,
+            # The fingerprint survives the rename, so _apply() can tell
+            # an applied rename from a temporary file that got lost.
+            'renames': [[relpath(t), relpath(f), get_file_fingerprint(t)]
+                        for t, f in self.renames],
+            'removals': [relpath(f) for f in self.removals],
+        }
+
+        # Writing the journal is the point of no return, so the temporary
+        # files must be durable first. Their content was synced when they
+        # were written; their directory entries are synced here, once per
+        # directory.
+        for dirname in sorted(self.tmp_dirs):
+            _fsync_dir(dirname)
+        journal_filename = os.path.join(self.path, JOURNAL_FILENAME)
+        write_file_atomic(journal_filename, json.dumps(journal))
+        _apply(self.path, journal)
+
+    def _reset(self):
+        self.renames = []
+        self.removals = []
+        self.tmp_dirs = set()
+        self.lock.release()
+
+def _apply(path, journal):
+    """
+    Applies the given journal and removes it. Raises OSError, and keeps
+    the journal, if a temporary file is missing and its rename was not
+    already applied.
+    """
+    dirs = set()
+    missing = []
+    for tmp_filename, filename, fingerprint in journal['renames']:
+        tmp_filename = os.path.join(path, tmp_filename)
+        filename = os.path.join(path, filename)
+        if os.path.exists(tmp_filename):
+            os.replace(tmp_filename, filename)
+        elif get_file_fingerprint(filename) != fingerprint:
+            missing.append(tmp_filename)
+        dirs.add(os.path.dirname(filename))
+    for filename in journal['removals']:
+        filename = os.path.join(path, filename)
+        if os.path.exists(filename):
+            os.remove(filename)
+        dirs.add(os.path.dirname(filename))
+
+    # The journal may only be removed once the changes are durable.
+    for dirname in sorted(dirs):
+        _fsync_dir(dirname)
+    if missing:
+        raise OSError('incomplete save, missing {}'.format(', '.join(missing)))
+    os.remove(os.path.join(path, JOURNAL_FILENAME))
+
+def recover(path, dirs):
+    """
+    Completes or reverts a save that was interrupted. path is the path
+    that holds the journal, and dirs are the directories that may contain
+    temporary files. Waits for saves of other processes to finish.
+    """
+    with JournalLock(path):
+        _recover(path, dirs)
+
+def _recover(path, dirs):
+    # Must only be called while holding the JournalLock.
+    journal_filename = os.path.join(path, JOURNAL_FILENAME)
+    try:
+        with open(journal_filename, 'r') as fp:
+            journal = json.load(fp)
+    except FileNotFoundError:
+        journal = None
+    except (OSError, ValueError) as e:
+        # Cannot happen, as the journal is written atomically.
+        sys.stderr.write('WARN: ignoring invalid {}: {}\n'.format(journal_filename, e))
+        journal = None
+
+    if journal is not None:
+        sys.stderr.write('Completing interrupted save in {}\n'.format(path))
+        try:
+            _apply(path, journal)
+        except OSError as e:
+            # Retrying cannot bring the files back. Keep the journal for
+            # inspection, but out of the way, so the directory stays usable.
+            sys.stderr.write('WARN: {}: {}\n'.format(path, e))
+            os.replace(journal_filename, journal_filename+'.failed')
+
+    # Anything left over belongs to a save that never committed.
+    for dirname in dirs+[path]:
+        for pattern in ('*'+TMP_EXT, '.*'+TMP_EXT):
+            for tmp_filename in glob.glob(os.path.join(dirname, pattern)):
+                os.remove(tmp_filename)
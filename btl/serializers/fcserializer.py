@@ -10,12 +10,19 @@ import glob
 import json
 import shutil
 import copy
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
-from .. import Machine, Library, Shape, Tool
-from ..shape import builtin_shapes
-from ..params import Param, IntParam, FloatParam, DistanceParam
+from .. import Machine, Library, Shape, Tool, ToolProxy
+from ..shape import builtin_shapes, get_icon_filename_from_shape_filename
+from ..params import Param, IntParam, FloatParam, DistanceParam, param_from_record
 from ..fcutil import *
+from ..util import get_file_fingerprint
 from .serializer import Serializer
+from .fcindex import INDEX_FILENAME, LoadIndex
+from .fccodec import get_tool_codec
+from .fcjournal import JournalLock, WriteBatch, write_file_atomic, \
+                       write_file_atomic_with, recover
 
 TOOL_DIR = 'Bit'
 LIBRARY_DIR = 'Library'
@@ -29,10 +36,150 @@ class FCSerializer(Serializer):
     LIBRARY_EXT = '.fctl'
     SHAPE_EXT = '.fcstd'
     MACHINE_EXT = '.json'
+    STORES_TOOLS_IN_LIBRARY = False
+    LOAD_WORKERS = 8
 
-    def __init__(self, path):
+    def __init__(self, path, workers=None):
         self.set_tool_dir(path)
 
+        # Number of threads that read files in parallel when a ToolDB is
+        # loaded. Mostly helps with network file systems.
+        self.workers = self.LOAD_WORKERS if workers is None else workers
+
+        # While a ToolDB is loaded, maps tool IDs to the loaded Tool, so
+        # that each tool file is only read once, and libraries share the
+        # Tool objects with the ToolDB.
+        self.loaded_tools = None
+
+        # While a ToolDB is loaded, maps shape names to the loaded Shape.
+        # Each tool gets a copy.
+        self.loaded_shapes = None
+
+        # While a ToolDB is loaded, maps shape filenames to the ToolCodec,
+        # so that the shape file is not checked for changes for every tool.
+        self.loaded_codecs = None
+
+        # While a ToolDB is loaded, the index of decoded tools.
+        self.index = None
+
+        # Whether tools found in the index are returned as ToolProxy.
+        self.lazy = False
+
+        # While a ToolDB is saved, the WriteBatch that collects all writes.
+        self.batch = None
+
+        # While a ToolDB is loaded, maps the filenames of the tool and
+        # library files to a tuple (fingerprint, attrs, error) holding the
+        # result of reading them in advance.
+        self.prefetched = None
+
+    def begin_deserialize(self, lazy=False):
+        self._recover()
+        self.lazy = lazy
+        self.loaded_tools = {}
+        self.loaded_shapes = {}
+        self.loaded_codecs = {}
+        self.index = LoadIndex(os.path.join(self.path, INDEX_FILENAME))
+        self.prefetched = self._prefetch_files()
+
+    def end_deserialize(self):
+        self.index.save()
+        shape_cache.flush()
+        self.prefetched = None
+        self.loaded_tools = None
+        self.loaded_shapes = None
+        self.loaded_codecs = None
+        self.index = None
+        self.lazy = False
+
+    def begin_serialize(self):
+        self.batch = WriteBatch(self.path, self._get_dirs())
+
+    def end_serialize(self):
+        try:
+            self.batch.commit()
+        finally:
+            self.batch = None
+
+    def abort_serialize(self):
+        self.batch.abort()
+        self.batch = None
+
+    def _get_dirs(self):
+        return [self.tool_path, self.lib_path, self.shape_path, self.machine_path]
+
+    def _recover(self):
+        # Completes or reverts a save that was interrupted by a crash.
+        recover(self.path, self._get_dirs())
+
+    def _write_json(self, filename, attrs):
+        text = json.dumps(attrs, sort_keys=True, indent=2)
+        if self.batch is None:
+            # The lock keeps recovery from deleting the temporary file.
+            with JournalLock(self.path):
+                write_file_atomic(filename, text)
+        else:
+            self.batch.write(filename, text)
+
+    def _write_with(self, filename, write_func):
+        if self.batch is None:
+            with JournalLock(self.path):
+                write_file_atomic_with(filename, write_func)
+        else:
+            self.batch.write_with(filename, write_func)
+
+    def _remove_file(self, filename):
+        if self.batch is None:
+            os.remove(filename)
+        else:
+            self.batch.remove(filename)
+
+    def _prefetch_files(self):
+        # Reads all tool and library files using a thread pool. The objects
+        # are still created one after another, in the same order as
+        # without prefetching.
+        filenames = self._get_library_filenames()
+        known_fingerprints = [None]*len(filenames)
+        for filename in self._get_tool_filenames():
+            # Tool files that are unchanged since the index was made are
+            # not read.
+            record = self.index.records.get(self._name_from_filename(filename))
+            filenames.append(filename)
+            known_fingerprints.append(record and record['fingerprint'])
+
+        if self.workers <= 1 or len(filenames) <= 1:
+            results = map(self._prefetch_file, filenames, known_fingerprints)
+            return dict(zip(filenames, results))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self._prefetch_file, filenames, known_fingerprints)
+            return dict(zip(filenames, results))
+
+    def _prefetch_file(self, filename, known_fingerprint=None):
+        # Runs in a worker thread.
+        fingerprint = get_file_fingerprint(filename)
+        if fingerprint is not None and fingerprint == known_fingerprint:
+            return fingerprint, None, None
+        try:
+            with open(filename, "r") as fp:
+                return fingerprint, json.loads(fp.read()), None
+        except (OSError, ValueError) as e:
+            return fingerprint, None, e
+
+    def _pop_prefetched(self, filename):
+        if self.prefetched is None:
+            return None
+        return self.prefetched.pop(filename, None)
+
+    def _read_json(self, filename, prefetched=None):
+        if prefetched is not None:
+            fingerprint, attrs, error = prefetched
+            if error is not None:
+                raise error
+            if attrs is not None:
+                return attrs
+        with open(filename, "r") as fp:
+            return json.load(fp)
+
     def set_tool_dir(self, path):
         self.path = path
         self.tool_path = os.path.join(path, TOOL_DIR)
@@ -97,7 +244,7 @@ class FCSerializer(Serializer):
 
     def _remove_machine_by_id(self, id):
         filename = self._machine_filename_from_name(id)
-        os.remove(filename)
+        self._remove_file(filename)
 
     def _get_machine_ids(self):
         return [self._name_from_filename(f)
@@ -105,7 +252,7 @@ class FCSerializer(Serializer):
 
     def _remove_library_by_id(self, id):
         filename = self._library_filename_from_name(id)
-        os.remove(filename)
+        self._remove_file(filename)
 
     def _get_library_ids(self):
         return [self._name_from_filename(f)
@@ -128,6 +275,10 @@ class FCSerializer(Serializer):
         for id in existing:
             self._remove_machine_by_id(id)
 
+    def remove_machine(self, id):
+        if id in self._get_machine_ids():
+            self._remove_machine_by_id(id)
+
     def deserialize_machines(self):
         return [self.deserialize_machine(id)
                 for id in self._get_machine_ids()]
@@ -142,11 +293,13 @@ class FCSerializer(Serializer):
         attrs["max-rpm"] = machine.max_rpm.format()
         attrs["min-feed"] = machine.min_feed.format()
         attrs["max-feed"] = machine.max_feed.format()
+        if machine.torque_curve:
+            # List of [RPM, torque in Nm] pairs.
+            attrs["torque-curve"] = [list(p) for p in machine.torque_curve]
 
         if not filename:
             filename = self._machine_filename_from_name(machine.id)
-        with open(filename, "w") as fp:
-            json.dump(attrs, fp, sort_keys=True, indent=2)
+        self._write_json(filename, attrs)
         return attrs
 
     def deserialize_machine(self, id):
@@ -171,7 +324,8 @@ class FCSerializer(Serializer):
                           min_rpm=min_rpm,
                           max_rpm=max_rpm,
                           min_feed=min_feed,
-                          max_feed=max_feed)
+                          max_feed=max_feed,
+                          torque_curve=attrs.get('torque-curve'))
 
         return machine
 
@@ -184,6 +338,10 @@ class FCSerializer(Serializer):
         for id in existing:
             self._remove_library_by_id(id)
 
+    def remove_library(self, id):
+        if id in self._get_library_ids():
+            self._remove_library_by_id(id)
+
     def deserialize_libraries(self):
         return [self.deserialize_library(id)
                 for id in self._get_library_ids()]
@@ -204,15 +362,15 @@ class FCSerializer(Serializer):
                 'nr': tool_no,
                 'path': os.path.basename(tool_filename),
             }
-            if tool.pocket:
-                tool_ref['pocket'] = tool.pocket
+            pocket = library.get_pocket(tool)
+            if pocket:
+                tool_ref['pocket'] = pocket
             tools.append(tool_ref)
         attrs["tools"] = tools
 
         if not filename:
             filename = self._library_filename_from_name(library.id)
-        with open(filename, "w") as fp:
-            json.dump(attrs, fp, sort_keys=True, indent=2)
+        self._write_json(filename, attrs)
         return attrs
 
     @classmethod
@@ -224,8 +382,7 @@ class FCSerializer(Serializer):
         return self.deserialize_library_from_file(filename)
 
     def deserialize_library_from_file(self, filename):
-        with open(filename, "r") as fp:
-            attrs = json.load(fp)
+        attrs = self._read_json(filename, self._pop_prefetched(filename))
 
         id = self._name_from_filename(filename)
         label = attrs.get('label', id)
@@ -239,9 +396,9 @@ class FCSerializer(Serializer):
             except OSError as e:
                 sys.stderr.write('WARN: skipping {}: {}\n'.format(path, e))
                 continue
-            tool.pocket = tool_obj.get('pocket')
             tool_no = int(tool_no) if tool_no else library.get_next_tool_no()
             library.add_tool(tool, tool_no)
+            library.set_pocket(tool, tool_obj.get('pocket'))
 
         return library
 
@@ -251,12 +408,26 @@ class FCSerializer(Serializer):
 
     def serialize_shape(self, shape):
         filename = self._shape_filename_from_name(shape.name)
-        shape.write_to_file(filename)
+        if shape.filename != filename:
+            self._write_with(filename, shape.write_to_file)
 
         if shape.icon:
-            shape.write_icon_to_file()
+            icon_filename = get_icon_filename_from_shape_filename(filename,
+                                                                  shape.icon_type)
+            self._write_with(icon_filename, shape.write_icon_to_file)
 
     def deserialize_shape(self, name):
+        if self.loaded_shapes is None:
+            return self._deserialize_shape(name)
+        return copy.deepcopy(self._get_loaded_shape(name))
+
+    def _get_loaded_shape(self, name):
+        # The returned shape is shared, so it must be copied before use.
+        if name not in self.loaded_shapes:
+            self.loaded_shapes[name] = self._deserialize_shape(name)
+        return self.loaded_shapes[name]
+
+    def _deserialize_shape(self, name):
         filename = self._shape_filename_from_name(name)
         if name in Shape.reserved and not os.path.exists(filename):
             print("Copying required but non-existent shape:", filename)
@@ -284,7 +455,12 @@ class FCSerializer(Serializer):
         for filename in self._get_tool_filenames():
             name = self._name_from_filename(filename)
             if name not in tool_names:
-                os.remove(filename)
+                self._remove_file(filename)
+
+    def remove_tool(self, id):
+        filename = self._tool_filename_from_name(id)
+        if os.path.exists(filename):
+            self._remove_file(filename)
 
     def deserialize_tools(self):
         return [self.deserialize_tool(id)
@@ -297,54 +473,88 @@ class FCSerializer(Serializer):
         attrs["name"] = tool.label
         attrs["shape"] = tool.shape.name+self.SHAPE_EXT
         attrs["attribute"] = {k: v.format() for k, v in tool.attrs.items()}
-        attrs["parameter"] = {}
-
-        # Get the list of parameters that are supported by the shape. This
-        # is used to find the type of each parameter.
-        properties = load_shape_properties(tool.shape.filename)
-
-        # Walk through the supported properties, and copy them from the internal
-        # model to the tool file representation.
-        for groupname, propname, prop, enums in properties:
-            param = tool.shape.get_param(propname)
-
-            if isinstance(prop, bool):
-                value = 1 if param.v else 0
-            elif isinstance(prop, int):
-                value = str(param.v or 0)
-            elif isinstance(prop, (float, str)):
-                if param.v is None:
-                    continue
-                value = param.v
-            else:
-                # FIXME: this hack is used because FreeCAD writes these parameters using comma
-                # separator when run in the UI, but not when running it here. I couldn't yet
-                # figure out where this (likely locale dependent) setting is made.
-                value = str(param.v).replace('.', ',')
-                value = value+' '+param.unit
-
-            attrs["parameter"][propname] = value
+        # The codec knows the type of each parameter supported by the shape.
+        codec = get_tool_codec(tool.shape.filename)
+        attrs["parameter"] = codec.encode(tool.shape)
 
         # Write everything.
         filename = self._tool_filename_from_name(tool.id)
-        with open(filename, "w") as fp:
-            json.dump(attrs, fp, sort_keys=True, indent=2)
+        self._write_json(filename, attrs)
 
         return attrs
 
     def deserialize_tool(self, id):
+        if self.loaded_tools is None:
+            return self._deserialize_tool(id)
+        if id not in self.loaded_tools:
+            self.loaded_tools[id] = self._deserialize_tool(id)
+        return self.loaded_tools[id]
+
+    def _deserialize_tool_from_index(self, id, filename, fingerprint):
+        record = self.index.get(id, fingerprint)
+        if record is None:
+            return None
+
+        shape = self._get_loaded_shape(record['shape'])
+        if not self.lazy:
+            return self._tool_from_record(id, filename, record, shape)
+
+        # The record and the shared shape are all the proxy needs to
+        # create the tool later, so no files need to be read again.
+        loader = partial(self._tool_from_record, id, filename, record, shape)
+        return ToolProxy(record['label'],
+                         shape.name,
+                         record['summary'],
+                         shape.get_icon(),
+                         loader,
+                         id,
+                         filename=filename)
+
+    def _tool_from_record(self, id, filename, record, shape):
+        params = [param_from_record(p) for p in record['params']]
+        tool = Tool(record['label'], shape.copy(params), id=id, filename=filename)
+        for attr in record['attrs']:
+            param = param_from_record(attr)
+            tool.set_attrib(param.name, param)
+        return tool
+
+    def _get_tool_codec(self, shape_filename):
+        if self.loaded_codecs is None:
+            return get_tool_codec(shape_filename)
+        if shape_filename not in self.loaded_codecs:
+            self.loaded_codecs[shape_filename] = get_tool_codec(shape_filename)
+        return self.loaded_codecs[shape_filename]
+
+    def _deserialize_tool(self, id):
         filename = self._tool_filename_from_name(id)
+        prefetched = self._pop_prefetched(filename)
+        if self.index is not None:
+            # Must be taken before reading, in case the file is modified
+            # while reading it.
+            if prefetched is not None:
+                fingerprint = prefetched[0]
+            else:
+                fingerprint = get_file_fingerprint(filename)
+            tool = self._deserialize_tool_from_index(id, filename, fingerprint)
+            if tool is not None:
+                return tool
+
         try:
-            with open(filename, "r") as fp:
-                attrs = json.load(fp)
+            attrs = self._read_json(filename, prefetched)
         except json.decoder.JSONDecodeError:
             sys.stderr.write('Error: skipping invalid json file {}\n'.format(filename))
             return
 
-        # Create a tool.
+        # Create a tool. The codec knows the type of each parameter that is
+        # supported by the shape.
         shapename = self._shape_name_from_filename(attrs['shape'])
-        shape = self.deserialize_shape(shapename)
-        tool = Tool(attrs['name'], shape, id=id, filename=filename)
+        if self.loaded_shapes is None:
+            shape = self._deserialize_shape(shapename)
+        else:
+            shape = self._get_loaded_shape(shapename)
+        codec = self._get_tool_codec(shape.filename)
+        params = codec.decode(attrs['parameter'], filename)
+        tool = Tool(attrs['name'], shape.copy(params), id=id, filename=filename)
 
         # Load known attributes. Since the serialized file does not indicate
         # param types, we need to explicitely load known non-str attributes.
@@ -359,19 +569,6 @@ class FCSerializer(Serializer):
             param = Param(name=key, v=value)
             tool.set_attrib(key, param)
 
-        # Get the list of parameters that are supported by the shape. This
-        # is used to find the type of each parameter.
-        properties = load_shape_properties(tool.shape.filename)
-
-        # Walk through the supported properties, and copy them from the tool
-        # to the internal representation.
-        for groupname, propname, prop, enums in properties:
-            value = attrs['parameter'].pop(propname, None)
-            try:
-                param = tool_property_to_param(groupname, propname, prop, enums, value)
-            except (AttributeError, ValueError) as e:
-                print(f"Ouch! Unsupported attribute '{propname}' with value '{value}' in {filename}")
-                continue
-            tool.shape.set_param(param.name, param)
-
+        if self.index is not None and fingerprint is not None:
+            self.index.put(id, fingerprint, shapename, tool)
         return tool
@@ -30,6 +30,10 @@ class LinuxCNCSerializer(Serializer):
         filename = self._library_filename_from_id(id)
         os.remove(filename)
 
+    def remove_library(self, id):
+        if os.path.exists(self._library_filename_from_id(id)):
+            self._remove_library_by_id(id)
+
     def serialize_libraries(self, libraries):
         existing = set(self._get_library_ids())
         for library in libraries:
@@ -50,7 +54,7 @@ class LinuxCNCSerializer(Serializer):
             for tool_no, tool in sorted(library.tool_nos.items()):
                 fp.write("T{} {} D{} ;{}\n".format(
                     tool_no,
-                    'P{}'.format(tool.pocket or ''),
+                    'P{}'.format(library.get_pocket(tool) or ''),
                     tool.shape.get_diameter() or 2,
                     tool.label
                 ).encode("ascii","ignore"))
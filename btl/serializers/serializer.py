@@ -6,9 +6,37 @@ class Serializer():
     NAME = None
     LIBRARY_EXT = None
 
+    # Whether the tools are stored inside the library files. If so, a
+    # library is rewritten when one of its tools changes.
+    STORES_TOOLS_IN_LIBRARY = True
+
     def __init__(self, *args, **kwargs):
         raise NotImplemented
 
+    def begin_deserialize(self, lazy=False):
+        # Called by ToolDB.deserialize() before loading anything. May be
+        # used to share state (e.g. already loaded tools) within one load.
+        # If lazy is True, the serializer may return ToolProxy objects
+        # instead of tools.
+        return
+
+    def end_deserialize(self):
+        # Called by ToolDB.deserialize() when loading is complete.
+        return
+
+    def begin_serialize(self):
+        # Called by ToolDB before saving. May be used to group all writes
+        # of one save into a single transaction.
+        return
+
+    def end_serialize(self):
+        # Called by ToolDB when saving is complete.
+        return
+
+    def abort_serialize(self):
+        # Called by ToolDB instead of end_serialize() if saving failed.
+        return
+
     def serialize_machines(self, machines):
         # Should do nothing if not supported.
         return
@@ -24,6 +52,10 @@ class Serializer():
     def deserialize_machine(self, attrs):
         raise NotImplemented
 
+    def remove_machine(self, id):
+        # Should do nothing if not supported.
+        return
+
     def serialize_libraries(self, libraries):
         # Should do nothing if not supported.
         return
@@ -50,6 +82,10 @@ class Serializer():
     def deserialize_library_from_file(self, filename):
         return NotImplemented
 
+    def remove_library(self, id):
+        # Should do nothing if not supported.
+        return
+
     def deserialize_shapes(self):
         # Should return nothing if not supported.
         return []
@@ -74,6 +110,10 @@ class Serializer():
         # Should do nothing if not supported.
         return
 
+    def remove_tool(self, id):
+        # Should do nothing if not supported.
+        return
+
     def deserialize_tool(self, attrs):
         # Should do nothing if not supported.
         return
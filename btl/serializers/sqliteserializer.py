@@ -0,0 +1,400 @@
+import os
+import sys
+import copy
+import json
+import sqlite3
+from functools import partial
+from .. import Machine, Library, Shape, Tool, ToolProxy
+from ..shape import builtin_shapes, get_icon_filename_from_shape_filename
+from ..params import IntParam, FloatParam, param_to_record, param_from_record
+from ..fcutil import load_shape_properties, shape_properties_to_shape, shape_cache
+from .serializer import Serializer
+
+SCHEMA_VERSION = 2
+
+schema = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS machine (
+    id TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    max_power TEXT,
+    max_torque TEXT,
+    peak_torque_rpm TEXT,
+    min_rpm TEXT,
+    max_rpm TEXT,
+    min_feed TEXT,
+    max_feed TEXT,
+    torque_curve TEXT
+);
+CREATE TABLE IF NOT EXISTS library (
+    id TEXT PRIMARY KEY,
+    label TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS library_tool (
+    library_id TEXT NOT NULL REFERENCES library(id) ON DELETE CASCADE,
+    tool_no INTEGER NOT NULL,
+    tool_id TEXT NOT NULL,
+    pocket INTEGER,
+    PRIMARY KEY (library_id, tool_no)
+);
+CREATE INDEX IF NOT EXISTS library_tool_tool_id ON library_tool(tool_id);
+CREATE TABLE IF NOT EXISTS shape (
+    name TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    icon BLOB,
+    icon_type TEXT
+);
+CREATE TABLE IF NOT EXISTS tool (
+    id TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS tool_shape ON tool(shape);
+CREATE TABLE IF NOT EXISTS tool_param (
+    tool_id TEXT NOT NULL REFERENCES tool(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (tool_id, kind, name)
+);
+'''
+
+# Values of tool_param.kind
+PARAM = 'param' # A shape parameter
+ATTR = 'attr'   # A tool attribute
+
+class SQLiteSerializer(Serializer):
+    """
+    Stores everything in a single SQLite database file. Custom shape files
+    are stored in the database as well, and extracted into a directory
+    next to it when loaded, since FreeCAD needs them as files.
+    """
+    NAME = 'SQLite'
+    STORES_TOOLS_IN_LIBRARY = False
+
+    def __init__(self, path, *args, **kwargs):
+        self.path = path
+        if os.path.isdir(path):
+            raise ValueError(repr(path) + ' is a directory')
+        self.shape_path = os.path.splitext(path)[0]+'.shapes'
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.in_batch = False
+        self.lazy = False  # Whether tools are loaded as ToolProxy
+
+        # While a ToolDB is loaded, maps tool IDs and shape names to the
+        # loaded objects, as in FCSerializer.
+        self.loaded_tools = None
+        self.loaded_shapes = None
+
+        with self.db:
+            self.db.executescript(schema)
+            row = self.db.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+            version = int(row[0]) if row else SCHEMA_VERSION
+            if version > SCHEMA_VERSION:
+                raise ValueError('{} was created by a newer version (schema {})'.format(path, version))
+            if version < 2:
+                self.db.execute('ALTER TABLE tool ADD COLUMN summary TEXT')
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                            (str(SCHEMA_VERSION),))
+
+    def _commit(self):
+        if not self.in_batch:
+            self.db.commit()
+
+    def _execute(self, *args):
+        # Without a batch, every public method is its own transaction.
+        try:
+            return self.db.execute(*args)
+        except BaseException:
+            if not self.in_batch:
+                self.db.rollback()
+            raise
+
+    def _executemany(self, *args):
+        try:
+            return self.db.executemany(*args)
+        except BaseException:
+            if not self.in_batch:
+                self.db.rollback()
+            raise
+
+    def begin_serialize(self):
+        self.in_batch = True
+
+    def end_serialize(self):
+        self.in_batch = False
+        self.db.commit()
+
+    def abort_serialize(self):
+        self.in_batch = False
+        self.db.rollback()
+
+    def begin_deserialize(self, lazy=False):
+        self.lazy = lazy
+        self.loaded_tools = {}
+        self.loaded_shapes = {}
+
+    def end_deserialize(self):
+        shape_cache.flush()
+        self.lazy = False
+        self.loaded_tools = None
+        self.loaded_shapes = None
+
+    def _remove_missing(self, table, column, ids):
+        existing = set(row[0] for row in self._execute(f'SELECT {column} FROM {table}'))
+        self._executemany(f'DELETE FROM {table} WHERE {column}=?',
+                          [(id,) for id in existing-set(ids)])
+
+    def serialize_machines(self, machines):
+        for machine in machines:
+            self.serialize_machine(machine, commit=False)
+        self._remove_missing('machine', 'id', [m.id for m in machines])
+        self._commit()
+
+    def deserialize_machines(self):
+        rows = self._execute('SELECT * FROM machine ORDER BY id').fetchall()
+        return [self._machine_from_row(row) for row in rows]
+
+    def serialize_machine(self, machine, commit=True):
+        curve = json.dumps(machine.torque_curve) if machine.torque_curve else None
+        self._execute('INSERT OR REPLACE INTO machine VALUES (?,?,?,?,?,?,?,?,?,?)',
+                      (machine.id,
+                       machine.label,
+                       machine.max_power.format(),
+                       machine.max_torque.format(),
+                       machine.peak_torque_rpm.format(),
+                       machine.min_rpm.format(),
+                       machine.max_rpm.format(),
+                       machine.min_feed.format(),
+                       machine.max_feed.format(),
+                       curve))
+        if commit:
+            self._commit()
+
+    def deserialize_machine(self, id):
+        row = self._execute('SELECT * FROM machine WHERE id=?', (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        return self._machine_from_row(row)
+
+    def _machine_from_row(self, row):
+        (id, label, max_power, max_torque, peak_torque_rpm,
+         min_rpm, max_rpm, min_feed, max_feed, curve) = row
+        return Machine(label,
+                       id=id,
+                       max_power=FloatParam.from_value('max-power', max_power, 'kW'),
+                       max_torque=FloatParam.from_value('max-torque', max_torque, 'Nm'),
+                       peak_torque_rpm=IntParam.from_value('peak-torque-rpm', peak_torque_rpm),
+                       min_rpm=IntParam.from_value('min-rpm', min_rpm),
+                       max_rpm=IntParam.from_value('max-rpm', max_rpm),
+                       min_feed=FloatParam.from_value('min-feed', min_feed, 'mm/min'),
+                       max_feed=FloatParam.from_value('max-feed', max_feed, 'mm/min'),
+                       torque_curve=json.loads(curve) if curve else None)
+
+    def remove_machine(self, id):
+        self._execute('DELETE FROM machine WHERE id=?', (id,))
+        self._commit()
+
+    def serialize_libraries(self, libraries):
+        for library in libraries:
+            self.serialize_library(library, commit=False)
+        self._remove_missing('library', 'id', [l.id for l in libraries])
+        self._commit()
+
+    def deserialize_libraries(self):
+        if self.loaded_tools is not None:
+            # Load all tools at once, instead of one by one.
+            self._load_all_tools()
+        rows = self._execute('SELECT id FROM library ORDER BY id').fetchall()
+        return [self.deserialize_library(row[0]) for row in rows]
+
+    def serialize_library(self, library, filename=None, commit=True):
+        self._execute('INSERT OR REPLACE INTO library VALUES (?,?)',
+                      (library.id, library.label))
+        self._execute('DELETE FROM library_tool WHERE library_id=?', (library.id,))
+        self._executemany('INSERT INTO library_tool VALUES (?,?,?,?)',
+                          [(library.id, tool_no, tool.id, library.get_pocket(tool))
+                           for tool_no, tool in library.tool_nos.items()])
+        if commit:
+            self._commit()
+
+    def deserialize_library(self, id):
+        row = self._execute('SELECT label FROM library WHERE id=?', (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        library = Library(row[0], id=id)
+        rows = self._execute('SELECT tool_no, tool_id, pocket FROM library_tool'
+                             ' WHERE library_id=? ORDER BY tool_no', (id,))
+        for tool_no, tool_id, pocket in rows.fetchall():
+            try:
+                tool = self.deserialize_tool(tool_id)
+            except (KeyError, OSError) as e:
+                sys.stderr.write('WARN: skipping tool {}: {}\n'.format(tool_id, e))
+                continue
+            library.add_tool(tool, tool_no)
+            library.set_pocket(tool, pocket)
+        return library
+
+    def remove_library(self, id):
+        self._execute('DELETE FROM library WHERE id=?', (id,))
+        self._commit()
+
+    def deserialize_shapes(self):
+        rows = self._execute('SELECT name FROM shape ORDER BY name').fetchall()
+        return [self.deserialize_shape(row[0]) for row in rows]
+
+    def serialize_shape(self, shape):
+        # Builtin shapes are always loaded from the shape directory of BTL.
+        if shape.is_builtin():
+            return
+        with open(shape.filename, 'rb') as fp:
+            data = fp.read()
+        self._execute('INSERT OR REPLACE INTO shape VALUES (?,?,?,?)',
+                      (shape.name, data, shape.icon, shape.icon_type))
+        self._commit()
+
+    def deserialize_shape(self, name):
+        if self.loaded_shapes is None:
+            return self._deserialize_shape(name)
+        return copy.deepcopy(self._get_loaded_shape(name))
+
+    def _get_loaded_shape(self, name):
+        # The returned shape is shared, so it must be copied before use.
+        if name not in self.loaded_shapes:
+            self.loaded_shapes[name] = self._deserialize_shape(name)
+        return self.loaded_shapes[name]
+
+    def _deserialize_shape(self, name):
+        if name in Shape.reserved:
+            name = Shape.aliases.get(name, name)
+            return copy.deepcopy(builtin_shapes[name])
+
+        row = self._execute('SELECT data, icon, icon_type FROM shape WHERE name=?',
+                            (name,)).fetchone()
+        if row is None:
+            raise OSError('shape "{}" not found in {}'.format(name, self.path))
+        data, icon, icon_type = row
+
+        # FreeCAD can only read shapes from files, so extract the shape
+        # and its icon into the shape directory.
+        os.makedirs(self.shape_path, exist_ok=True)
+        filename = os.path.join(self.shape_path, name+'.fcstd')
+        self._extract(filename, data)
+        if icon:
+            self._extract(get_icon_filename_from_shape_filename(filename, icon_type), icon)
+
+        shape = Shape(name, filename)
+        properties = load_shape_properties(filename)
+        shape_properties_to_shape(properties, shape)
+        shape.load_or_create_icon()
+        return shape
+
+    def _extract(self, filename, data):
+        try:
+            with open(filename, 'rb') as fp:
+                if fp.read() == data:
+                    return
+        except OSError:
+            pass
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+
+    def serialize_tools(self, tools):
+        for tool in tools:
+            self.serialize_tool(tool, commit=False)
+        self._remove_missing('tool', 'id', [t.id for t in tools])
+        self._commit()
+
+    def deserialize_tools(self):
+        if self.loaded_tools is not None:
+            self._load_all_tools()
+            return list(self.loaded_tools.values())
+        rows = self._execute('SELECT id FROM tool ORDER BY id').fetchall()
+        return [self.deserialize_tool(row[0]) for row in rows]
+
+    def serialize_tool(self, tool, commit=True):
+        self._execute('INSERT OR REPLACE INTO tool VALUES (?,?,?,?)',
+                      (tool.id, tool.label, tool.shape.name, tool.get_summary()))
+        self._execute('DELETE FROM tool_param WHERE tool_id=?', (tool.id,))
+        records = [(tool.id, PARAM, p.name, json.dumps(param_to_record(p)))
+                   for p in tool.shape.params.values()]
+        records += [(tool.id, ATTR, name, json.dumps(param_to_record(p)))
+                    for name, p in tool.attrs.items()]
+        self._executemany('INSERT INTO tool_param VALUES (?,?,?,?)', records)
+        if commit:
+            self._commit()
+
+    def _tool_from_rows(self, id, label, shape, param_rows):
+        tool = Tool(label, copy.deepcopy(shape), id=id)
+        for kind, name, record in param_rows:
+            param = param_from_record(json.loads(record))
+            if kind == ATTR:
+                tool.set_attrib(name, param)
+            else:
+                tool.shape.set_param(name, param)
+        return tool
+
+    def _load_tool(self, id, label, shape):
+        rows = self._execute('SELECT kind, name, record FROM tool_param'
+                             ' WHERE tool_id=? ORDER BY kind, name', (id,)).fetchall()
+        return self._tool_from_rows(id, label, shape, rows)
+
+    def _tool_from_header(self, id, label, shape_name, summary):
+        # Returns a ToolProxy if lazy loading is possible, a Tool otherwise.
+        shape = self._get_loaded_shape(shape_name)
+        if summary is None:
+            # Saved by an older version.
+            return self._load_tool(id, label, shape)
+        loader = partial(self._load_tool, id, label, shape)
+        return ToolProxy(label, shape.name, summary, shape.get_icon(), loader, id)
+
+    def _load_all_tools(self):
+        # Loads all tools into the identity map, using one query per table.
+        rows = self._execute('SELECT id, label, shape, summary FROM tool ORDER BY id').fetchall()
+        params = {}
+        if not self.lazy:
+            param_rows = self._execute('SELECT tool_id, kind, name, record FROM tool_param'
+                                       ' ORDER BY tool_id, kind, name')
+            for tool_id, kind, name, record in param_rows:
+                params.setdefault(tool_id, []).append((kind, name, record))
+
+        for id, label, shape_name, summary in rows:
+            if id in self.loaded_tools:
+                continue
+            try:
+                if self.lazy:
+                    tool = self._tool_from_header(id, label, shape_name, summary)
+                else:
+                    shape = self._get_loaded_shape(shape_name)
+                    tool = self._tool_from_rows(id, label, shape, params.get(id, []))
+            except OSError as e:
+                sys.stderr.write('WARN: skipping tool {}: {}\n'.format(id, e))
+                continue
+            self.loaded_tools[id] = tool
+
+    def deserialize_tool(self, id):
+        if self.loaded_tools is not None and id in self.loaded_tools:
+            return self.loaded_tools[id]
+
+        row = self._execute('SELECT label, shape, summary FROM tool WHERE id=?',
+                            (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        label, shape_name, summary = row
+        if self.loaded_tools is None:
+            return self._load_tool(id, label, self.deserialize_shape(shape_name))
+        if self.lazy:
+            tool = self._tool_from_header(id, label, shape_name, summary)
+        else:
+            tool = self._load_tool(id, label, self._get_loaded_shape(shape_name))
+        self.loaded_tools[id] = tool
+        return tool
+
+    def remove_tool(self, id):
+        self._execute('DELETE FROM tool WHERE id=?', (id,))
+        self._commit()
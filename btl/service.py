@@ -0,0 +1,312 @@
+"""
+A local JSON-RPC 2.0 service that keeps a ToolDB, the tool pixmaps and
+the feeds & speeds results in memory, so that scripts (e.g. CAM post
+processors) do not pay for Python startup, ToolDB.deserialize() and
+pixmap rendering on every request.
+
+The service listens on a Unix socket, or on a TCP port on localhost.
+Requests and responses are JSON objects, one per line. See client.py
+for a client.
+"""
+import os
+import json
+import inspect
+import socket
+import threading
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from .db import ToolDB
+from .feeds import FeedCalc, operation
+from .feeds.material import catalog
+
+# JSON-RPC 2.0 error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+APPLICATION_ERROR = -32000
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super(RPCError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+def param_to_dict(param):
+    return {'value': param.v, 'unit': param.unit}
+
+def tool_to_dict(tool, params=False):
+    result = {
+        'id': tool.id,
+        'label': tool.label,
+        'shape': tool.shape.name,
+        'summary': tool.get_summary(),
+    }
+    if params:
+        result['params'] = {name: param_to_dict(param)
+                            for name, param in tool.shape.get_params()}
+        result['attrs'] = {name: param.format()
+                           for name, param in tool.attrs.items()}
+    return result
+
+class FeedsService(object):
+    """
+    Answers requests against a ToolDB. Requests are executed in a pool of
+    at most workers threads; when all workers and max_pending queued
+    requests are in use, connections are no longer read from until a
+    worker becomes available. At most max_connections clients are
+    connected at a time; further connections wait in the listen backlog
+    until a client disconnects.
+
+    Results of "calculate" requests are cached (up to cache_size of them),
+    and concurrent requests for the same calculation share one result.
+    """
+    def __init__(self, serializer, workers=4, max_pending=16, cache_size=256,
+                 max_connections=64):
+        self.serializer = serializer
+        self.workers = workers
+        self.max_connections = max_connections
+        self.cache_size = cache_size
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers+max_pending)
+        self.lock = threading.RLock()
+        self.pixmap_lock = threading.Lock()
+        self.results = OrderedDict()  # Maps calculation key to a Future
+        self.db = None
+        self.methods = {
+            'ping': self.ping,
+            'reload': self.reload,
+            'get_libraries': self.get_libraries,
+            'get_tools': self.get_tools,
+            'get_tool': self.get_tool,
+            'get_machines': self.get_machines,
+            'get_materials': self.get_materials,
+            'get_operations': self.get_operations,
+            'calculate': self.calculate,
+        }
+        self.reload()
+
+    def ping(self):
+        return 'pong'
+
+    def reload(self):
+        """
+        Reloads the ToolDB from the serializer and clears all caches.
+        """
+        db = ToolDB()
+        db.deserialize(self.serializer)
+        with self.lock:
+            self.db = db
+            self.results.clear()
+        return len(db.tools)
+
+    def _get_tool(self, id):
+        try:
+            return self.db.get_tool_by_id(id)
+        except KeyError:
+            raise RPCError(APPLICATION_ERROR, f'tool {id} not found')
+
+    def get_libraries(self):
+        return [{'id': lib.id, 'label': lib.label, 'tools': len(lib.tools)}
+                for lib in self.db.get_libraries()]
+
+    def get_tools(self, library=None):
+        if library is None:
+            tools = self.db.get_tools()
+        else:
+            try:
+                tools = self.db.get_library_by_id(library).get_tools()
+            except KeyError:
+                raise RPCError(APPLICATION_ERROR, f'library {library} not found')
+        return [tool_to_dict(tool) for tool in tools]
+
+    def get_tool(self, id):
+        return tool_to_dict(self._get_tool(id), params=True)
+
+    def get_machines(self):
+        return [{'id': machine.id, 'label': machine.label}
+                for machine in self.db.get_machines()]
+
+    def get_materials(self):
+        return [{'id': material.id, 'name': material.name}
+                for material in catalog.get_materials()]
+
+    def get_operations(self):
+        return [op.__name__ for op in operation.operations]
+
+    def calculate(self, tool, machine, material, op='Profiling', iterations=80):
+        """
+        Returns the best feeds & speeds result as a dict with the keys
+        "error" (None if the result is valid) and "params".
+        """
+        tool = self._get_tool(tool)
+        try:
+            machine = self.db.get_machine_by_id(machine)
+        except KeyError:
+            raise RPCError(APPLICATION_ERROR, f'machine {machine} not found')
+        try:
+            material = catalog.get_material(material)
+        except KeyError:
+            raise RPCError(APPLICATION_ERROR, f'material {material} not found')
+        ops = {o.__name__: o for o in operation.operations}
+        if op not in ops:
+            raise RPCError(INVALID_PARAMS, f'unknown operation {op}')
+        op = ops[op]
+
+        key = tool.id, machine.id, material.id, op.__name__, iterations
+        with self.lock:
+            future = self.results.get(key)
+            owner = future is None
+            if owner:
+                future = self.results[key] = Future()
+                if len(self.results) > self.cache_size:
+                    self.results.popitem(last=False)
+            else:
+                self.results.move_to_end(key)
+        if not owner:
+            return future.result()
+
+        try:
+            # The pixmap is cached in the tool, so it must only be built
+            # once. Its lookup tables are guarded by the pixmap itself.
+            with self.pixmap_lock:
+                tool.get_pixmap()
+            fc = FeedCalc(machine, tool, material, op=op)
+            error, params = fc.start(iterations=iterations)
+        except Exception as e:
+            # Errors are not cached; the request may be retried after a reload.
+            with self.lock:
+                self.results.pop(key, None)
+            if isinstance(e, AttributeError):
+                e = RPCError(APPLICATION_ERROR, str(e))
+            future.set_exception(e)
+            raise e
+
+        result = {
+            'error': error,
+            'params': {name: param_to_dict(param)
+                       for name, param in params.items()},
+        }
+        future.set_result(result)
+        return result
+
+    def dispatch(self, request):
+        """
+        Executes a single JSON-RPC request (a dict), and returns the
+        response dict, or None if the request was a notification.
+        """
+        id = request.get('id') if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+                raise RPCError(INVALID_REQUEST, 'invalid request')
+            method = self.methods.get(request['method'])
+            if method is None:
+                raise RPCError(METHOD_NOT_FOUND, 'method {} not found'.format(request['method']))
+            params = request.get('params', {})
+            args, kwargs = (params, {}) if isinstance(params, list) else ((), params)
+            try:
+                inspect.signature(method).bind(*args, **kwargs)
+            except TypeError as e:
+                raise RPCError(INVALID_PARAMS, str(e))
+            result = method(*args, **kwargs)
+        except RPCError as e:
+            response = {'jsonrpc': '2.0', 'id': id,
+                        'error': {'code': e.code, 'message': e.message}}
+        except Exception as e:
+            response = {'jsonrpc': '2.0', 'id': id,
+                        'error': {'code': INTERNAL_ERROR, 'message': str(e)}}
+        else:
+            response = {'jsonrpc': '2.0', 'id': id, 'result': result}
+
+        if isinstance(request, dict) and 'id' not in request:
+            return None
+        return response
+
+    def handle_line(self, line):
+        """
+        Parses and executes one line of input in the worker pool, and
+        returns the response line, or None if there is nothing to return.
+        Blocks while the pool is saturated.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {'jsonrpc': '2.0', 'id': None,
+                        'error': {'code': PARSE_ERROR, 'message': str(e)}}
+            return json.dumps(response)
+
+        with self.slots:
+            response = self.executor.submit(self.dispatch, request).result()
+        if response is None:
+            return None
+        return json.dumps(response)
+
+    def serve(self, address):
+        """
+        Serves requests until interrupted. The address is either a path
+        to a Unix socket, or a (host, port) tuple.
+        """
+        server = create_server(self, address)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.executor.shutdown(wait=False)
+            if isinstance(address, str) and os.path.exists(address):
+                os.remove(address)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.service.handle_line(line)
+            if response is not None:
+                self.wfile.write(response.encode('utf-8')+b'\n')
+                self.wfile.flush()
+
+class _BoundedThreadingMixIn(socketserver.ThreadingMixIn):
+    """
+    Like ThreadingMixIn, but starts at most connection_slots threads at
+    a time. While all are busy, no further connections are accepted.
+    """
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        self.connection_slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self.connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connection_slots.release()
+
+class _TCPServer(_BoundedThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+
+if hasattr(socket, 'AF_UNIX'):
+    class _UnixServer(_BoundedThreadingMixIn, socketserver.UnixStreamServer):
+        pass
+
+def create_server(service, address):
+    """
+    Returns a socketserver for the given service, but does not start it.
+    The address is either a path to a Unix socket, or a (host, port)
+    tuple.
+    """
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.remove(address)  # Left over from an earlier run
+        server = _UnixServer(address, _RequestHandler)
+    else:
+        server = _TCPServer(tuple(address), _RequestHandler)
+    server.service = service
+    server.connection_slots = threading.BoundedSemaphore(service.max_connections)
+    return server
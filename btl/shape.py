@@ -1,5 +1,6 @@
 import os
 import sys
+import copy
 import glob
 import shutil
 from . import const
@@ -7,6 +8,7 @@ from .params import Param, DistanceParam
 from .i18n import translate
 from .toolmaterial import ToolMaterial, HSS, Carbide
 from .util import file_is_newer, get_abbreviations_from_svg
+from .toolprofile import get_profile_cutting_edge
 from .fcutil import load_shape_properties, \
                     shape_property_to_param, \
                     shape_properties_to_shape, \
@@ -109,6 +111,7 @@ class Shape():
         self.icon_type = None # Shape PNG as a binary string
         self.abbr = {} # map param name to an abbreviation, if found in SVG
         self.params = {} # map param name to a param
+        self.profile_cutting_edge = None # (param values, cutting edge)
 
         # Load the shape files. Builtin types get preference, so they
         # overwrite any values already defined above.
@@ -127,6 +130,21 @@ class Shape():
     def __eq__(self, other):
         return self.name == other.name
 
+    def copy(self, params=()):
+        """
+        Returns a copy of the shape, in which the given params replace
+        those with the same name. Other than the params, a shape holds
+        only values that are never changed in place, so they are shared.
+        """
+        shape = copy.copy(self)
+        replaced = {p.name: p for p in params}
+        shape.params = {}
+        for name, param in self.params.items():
+            param = replaced.pop(name, None) or param.copy()
+            shape.params[name] = param
+        shape.params.update(replaced)
+        return shape
+
     def to_dict(self):
         return {
             'name': self.name,
@@ -134,6 +152,16 @@ class Shape():
             'params': [p.to_dict() for p in self.params.values()],
         }
 
+    def get_state(self):
+        """
+        Returns a value that compares unequal to an earlier result if
+        anything about the shape that is serialized was changed since.
+        """
+        return (self.name,
+                self.filename,
+                self.get_icon_len(),
+                tuple((k, p.v, p.unit) for k, p in sorted(self.params.items())))
+
     def set_param(self, name, value):
         if not isinstance(name, str):
             paramtype = type(name)
@@ -219,7 +247,16 @@ class Shape():
 
     def get_cutting_edge(self):
         item = self.params.get('CuttingEdgeHeight')
-        return item.value('mm') if item else None
+        if item:
+            return item.value('mm')
+
+        # Some shapes (e.g. dovetail, threadmill) have no cutting edge
+        # height property; it is implied by their profile instead. Building
+        # the profile is expensive, so it is only done when a param changed.
+        values = tuple((k, p.v, p.unit) for k, p in sorted(self.params.items()))
+        if self.profile_cutting_edge is None or self.profile_cutting_edge[0] != values:
+            self.profile_cutting_edge = values, get_profile_cutting_edge(self)
+        return self.profile_cutting_edge[1]
 
     def get_length(self):
         item = self.params.get('Length')
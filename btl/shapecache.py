@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import threading
+from .fcstd import Quantity
+from .util import sha256sum, get_file_fingerprint
+
+CACHE_VERSION = 1
+
+def property_to_record(group, name, prop, enums):
+    if isinstance(prop, Quantity):
+        return [group, name, prop.Value, enums, [prop.Unit.Type, prop.unit]]
+    return [group, name, prop, enums, None]
+
+def property_from_record(record):
+    group, name, value, enums, quantity = record
+    if quantity is not None:
+        value = Quantity(value, *quantity)
+    return group, name, value, enums
+
+class ShapePropertyCache(object):
+    """
+    Caches the properties of shape files on disk, so that they survive
+    between sessions. A cached entry is used if the fingerprint (mtime,
+    size, inode) of the shape file is unchanged. Otherwise, the SHA256 of
+    the file is compared, so that e.g. copied or touched files do not need
+    to be parsed again.
+
+    New and updated entries are written in batches: when batch_size of
+    them are pending, and on flush(). Entries of shape files that were
+    removed or changed since are dropped whenever the cache is written.
+    """
+    def __init__(self, filename, batch_size=64):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.records = None  # Maps absolute shape filename to a record
+        self.pending = {}  # Records that were not written yet
+        self.loaded = {}  # Maps absolute shape filename to (fingerprint, properties)
+        self.lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.filename, 'r') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != CACHE_VERSION:
+            return {}
+        return data.get('shapes', {})
+
+    def _add(self, path, record):
+        self.records[path] = record
+        self.pending[path] = record
+        if len(self.pending) >= self.batch_size:
+            self._write()
+
+    def flush(self):
+        """
+        Writes any pending entries to disk.
+        """
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if not self.pending:
+            return
+
+        # Merge with the file on disk, as other processes may have added
+        # shapes in the meantime.
+        records = self._read()
+        records.update(self.pending)
+        self.pending = {}
+        records = {path: record for path, record in records.items()
+                   if get_file_fingerprint(path) == record['fingerprint']}
+        self.records = records
+        data = {
+            'version': CACHE_VERSION,
+            'shapes': records,
+        }
+        tmp_filename = '{}.{}.tmp'.format(self.filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with open(tmp_filename, 'w') as fp:
+                json.dump(data, fp, separators=(',', ':'))
+            os.replace(tmp_filename, self.filename)
+        except OSError as e:
+            # It is only a cache.
+            sys.stderr.write('WARN: could not write {}: {}\n'.format(self.filename, e))
+
+    def get(self, filename, read_properties):
+        """
+        Returns the properties of the given shape file, calling
+        read_properties(filename) if they are not in the cache.
+        """
+        path = os.path.abspath(filename)
+        fingerprint = get_file_fingerprint(path)
+        with self.lock:
+            loaded = self.loaded.get(path)
+            if fingerprint is not None and loaded and loaded[0] == fingerprint:
+                return loaded[1]
+
+            properties = self._get_from_records(path, fingerprint)
+            if properties is None:
+                # Both must be taken before reading, in case the file is
+                # modified while reading it.
+                filehash = sha256sum(path)
+                properties = read_properties(filename)
+                record = {
+                    'fingerprint': fingerprint,
+                    'sha256': filehash,
+                    'properties': [property_to_record(*p) for p in properties],
+                }
+                if fingerprint is not None:
+                    self._add(path, record)
+
+            self.loaded[path] = fingerprint, properties
+            return properties
+
+    def _get_from_records(self, path, fingerprint):
+        if self.records is None:
+            self.records = self._read()
+        record = self.records.get(path)
+        if record is None or fingerprint is None:
+            return None
+
+        if record['fingerprint'] != fingerprint:
+            if record['sha256'] != sha256sum(path):
+                return None
+            record['fingerprint'] = fingerprint
+            self._add(path, record)
+
+        return [property_from_record(r) for r in record['properties']]
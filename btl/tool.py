@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 import uuid
 import math
-from copy import deepcopy
+import warnings
+import numpy as np
+from copy import copy, deepcopy
 from .feeds.util import cantilever_deflect_endload, cantilever_deflect_uniload
 from .feeds import operation
 from .shape import Shape
@@ -11,7 +13,9 @@ from .toolpixmap import EndmillPixmap, \
                         BullnosePixmap, \
                         ChamferPixmap, \
                         VBitPixmap, \
-                        DrillPixmap
+                        DrillPixmap, \
+                        ProfilePixmap
+from .toolprofile import has_profile, get_profile_from_shape
 
 class Tool(object):
     API_VERSION = 1
@@ -22,7 +26,8 @@ class Tool(object):
         self.filename = filename # Keep in mind: Not every tool is file-based
         self.shape = Shape(shape) if isinstance(shape, str) else shape
         self.pixmap = None  # for caching a ToolPixmap
-        self.pocket = None
+        self.interpolated_pixmap = None  # see get_pixmap()
+        self._pocket = None  # Only for the deprecated pocket property
 
         # Used for internal attributes, but also by the serializer to
         # store attributes unknown to BTL. Maps name to Param.
@@ -54,6 +59,16 @@ class Tool(object):
             'attrs': [p.to_dict() for p in self.attrs.values()],
         }
 
+    def get_state(self):
+        """
+        Returns a value that compares unequal to an earlier result if
+        anything about the tool that is serialized was changed since.
+        Used by ToolDB to find modified tools.
+        """
+        return (self.label,
+                self.shape.get_state(),
+                tuple((k, p.v, p.unit) for k, p in sorted(self.attrs.items())))
+
     def set_attrib(self, name, value):
         if not isinstance(name, str):
             paramtype = type(name)
@@ -78,8 +93,31 @@ class Tool(object):
     def get_label(self):
         return self.label
 
+    def get_summary(self):
+        return self.shape.get_param_summary()
+
+    def get_icon(self):
+        return self.shape.get_icon()
+
+    @property
+    def pocket(self):
+        warnings.warn('Tool.pocket is deprecated and is not saved;'
+                      ' use Library.get_pocket() instead',
+                      DeprecationWarning, stacklevel=2)
+        return self._pocket
+
+    @pocket.setter
+    def pocket(self, pocket):
+        warnings.warn('Tool.pocket is deprecated and is not saved;'
+                      ' use Library.set_pocket() instead',
+                      DeprecationWarning, stacklevel=2)
+        self._pocket = pocket
+
     def set_pocket(self, pocket):
-        self.pocket = pocket
+        warnings.warn('Tool.set_pocket() is deprecated and is not saved;'
+                      ' use Library.set_pocket() instead',
+                      DeprecationWarning, stacklevel=2)
+        self._pocket = pocket
 
     def set_stickout(self, stickout, unit):
         param = DistanceParam.from_value('btl-stickout', float(stickout), unit)
@@ -176,6 +214,8 @@ class Tool(object):
     def supports_feeds_and_speeds(self):
         if not self.shape.is_builtin():
             return False
+        if has_profile(self.shape):
+            return True
         return self.shape.name in ('endmill',
                                    'torus',
                                    'bullnose',
@@ -183,47 +223,72 @@ class Tool(object):
                                    'chamfer',
                                    'vbit')
 
-    def get_pixmap(self):
-        if self.pixmap:
-            return self.pixmap
+    def get_pixmap(self, interpolate=False):
+        """
+        Returns the ToolPixmap of the tool, or None if its shape has none.
+        If interpolate is True, lookups interpolate between pixels (see
+        ToolPixmap). Each variant is built only once.
+        """
+        pixmap = self.interpolated_pixmap if interpolate else self.pixmap
+        if pixmap:
+            return pixmap
+        pixmap = self._create_pixmap(interpolate)
+        if interpolate:
+            self.interpolated_pixmap = pixmap
+        else:
+            self.pixmap = pixmap
+        return pixmap
+
+    def _create_pixmap(self, interpolate):
         stickout = self.get_stickout()
         shank_d = self.shape.get_shank_diameter()
         diameter = self.shape.get_diameter()
         cutting_edge = self.shape.get_cutting_edge()
         if self.shape.name == 'endmill':
-            self.pixmap = EndmillPixmap(stickout,
-                                        shank_d,
-                                        diameter,
-                                        cutting_edge)
+            return EndmillPixmap(stickout,
+                                 shank_d,
+                                 diameter,
+                                 cutting_edge,
+                                 interpolate=interpolate)
         elif self.shape.name in ('torus', 'bullnose', 'ballend'):
             corner_r = self.shape.get_corner_radius()
-            self.pixmap = BullnosePixmap(stickout,
-                                         shank_d,
-                                         diameter,
-                                         cutting_edge=cutting_edge,
-                                         corner_radius=corner_r)
+            return BullnosePixmap(stickout,
+                                  shank_d,
+                                  diameter,
+                                  cutting_edge=cutting_edge,
+                                  corner_radius=corner_r,
+                                  interpolate=interpolate)
         elif self.shape.name == 'vbit':
             ce_angle = self.shape.get_cutting_edge_angle()
             tip_w = self.shape.get_tip_diameter()
-            self.pixmap = VBitPixmap(stickout,
-                                     shank_d,
-                                     diameter,
-                                     brim=cutting_edge,
-                                     lead_angle=ce_angle/2,
-                                     tip_w=tip_w)
+            return VBitPixmap(stickout,
+                              shank_d,
+                              diameter,
+                              brim=cutting_edge,
+                              lead_angle=ce_angle/2,
+                              tip_w=tip_w,
+                              interpolate=interpolate)
         elif self.shape.name == 'chamfer':
             radius = self.shape.get_radius()
-            self.pixmap = ChamferPixmap(stickout,
-                                        shank_d,
-                                        diameter,
-                                        brim=cutting_edge,
-                                        radius=radius)
+            return ChamferPixmap(stickout,
+                                 shank_d,
+                                 diameter,
+                                 brim=cutting_edge,
+                                 radius=radius,
+                                 interpolate=interpolate)
         elif self.shape.name == 'drill':
             angle = self.shape.get_tip_angle()
-            self.pixmap = DrillPixmap(stickout,
-                                      diameter,
-                                      angle=angle)
-        return self.pixmap
+            return DrillPixmap(stickout,
+                               diameter,
+                               angle=angle,
+                               interpolate=interpolate)
+        elif has_profile(self.shape):
+            # Shapes without a dedicated pixmap are described by their
+            # side profile instead. Their lookups are exact either way.
+            profile = get_profile_from_shape(self.shape, stickout)
+            if profile is not None:
+                return ProfilePixmap(profile)
+        return None
 
     def set_materials(self, materials):
         self.attrs['btl-materials'] = Param('btl-materials', v=materials)
@@ -307,21 +372,10 @@ class Tool(object):
 
         return solid_inertia, fluted_inertia
 
-    def get_deflection(self, doc, force):
-        """
-        Assuming a non-plunging/non-drilling operation, this function returns the
-        deflection resulting from the engagement with the given force.
-
-        Returns a single factor, the deflection.
-
-        doc: mm
-        force: N
-        returns: mm
-        """
+    def _get_deflection(self, doc, force, stickout, cutting_edge):
+        # See get_deflections().
         # "Metal Cutting Theory and Practice", By David A. Stephenson, John S. Agapiou, p362
         # "Structural modeling of end mills for form error and stability analysis", E.B. Kivanc, E. Budak
-        stickout = self.get_stickout()
-        cutting_edge = self.shape.get_cutting_edge() or stickout
         shank_l = stickout-cutting_edge  # Length of the shank portion
         non_cutting = cutting_edge-doc # Length of the non-cutting flute portion
 
@@ -340,6 +394,52 @@ class Tool(object):
         # which should be negligible for cutting purposes.
         return deflectionShank+deflectionNonCutting+deflectionCutting
 
+    def get_deflection(self, doc, force):
+        """
+        Assuming a non-plunging/non-drilling operation, this function returns the
+        deflection resulting from the engagement with the given force.
+
+        Returns a single factor, the deflection.
+
+        doc: mm
+        force: N
+        returns: mm
+        """
+        stickout = self.get_stickout()
+        cutting_edge = self._get_cutting_edges(stickout)
+        return self._get_deflection(doc, force, stickout, cutting_edge)
+
+    def get_deflections(self, docs, forces, stickouts=None):
+        """
+        Like get_deflection(), but accepts arrays (or scalars) that are
+        broadcast against each other. If no stickouts are given, the
+        stickout of the tool is used. Flutes longer than a given stickout
+        are assumed to be partially inside the holder, so stickout sweeps
+        may go below the flute length.
+
+        Returns an array of deflections in mm.
+        """
+        docs = np.asarray(docs, dtype=float)
+        forces = np.asarray(forces, dtype=float)
+        stickouts = self._get_stickouts(stickouts)
+        cutting_edges = self._get_cutting_edges(stickouts)
+        return self._get_deflection(docs, forces, stickouts, cutting_edges)
+
+    def _get_stickouts(self, stickouts):
+        if stickouts is None:
+            return np.asarray(self.get_stickout(), dtype=float)
+        return np.asarray(stickouts, dtype=float)
+
+    def _get_cutting_edges(self, stickouts):
+        # The part of the flutes that sticks out of the holder. Used by all
+        # deflection and bend limit calculations; takes a scalar or an array.
+        cutting_edge = self.shape.get_cutting_edge()
+        if not cutting_edge:
+            return stickouts
+        if np.ndim(stickouts):
+            return np.minimum(cutting_edge, stickouts)
+        return min(cutting_edge, stickouts)
+
     def get_max_deflection(self, force):
         """
         Returns the theoretical maximum deflection, were all forces acting
@@ -348,7 +448,20 @@ class Tool(object):
         force: N
         returns: mm
         """
-        stickout = self.get_stickout()
+        return self._get_max_deflection(force, self.get_stickout())
+
+    def get_max_deflections(self, forces, stickouts=None):
+        """
+        Like get_max_deflection(), but accepts arrays (or scalars) that
+        are broadcast against each other. If no stickouts are given, the
+        stickout of the tool is used.
+
+        Returns an array of deflections in mm.
+        """
+        forces = np.asarray(forces, dtype=float)
+        return self._get_max_deflection(forces, self._get_stickouts(stickouts))
+
+    def _get_max_deflection(self, force, stickout):
         tool_material = self.get_material()
         solid_inertia, fluted_inertia = self.get_inertia()
         return cantilever_deflect_endload(force,
@@ -365,18 +478,38 @@ class Tool(object):
         F = (I * stress) / (r * l)
         Returns force in N
         """
-        # TODO: Estimate Yield for the fluted portion of the end mill separately
         stickout = self.get_stickout()
+        cutting_edge = self._get_cutting_edges(stickout)
+        solid_limit, fluted_limit = self._get_bend_limits(doc, stickout, cutting_edge)
+        return float(min(solid_limit, fluted_limit))
+
+    def get_bend_limits(self, docs, stickouts=None):
+        """
+        Like get_bend_limit(), but accepts arrays (or scalars) that are
+        broadcast against each other. If no stickouts are given, the
+        stickout of the tool is used.
+
+        Returns an array of forces in N.
+        """
+        docs = np.asarray(docs, dtype=float)
+        stickouts = self._get_stickouts(stickouts)
+        cutting_edges = self._get_cutting_edges(stickouts)
+        solid_limit, fluted_limit = self._get_bend_limits(docs, stickouts, cutting_edges)
+        return np.minimum(solid_limit, fluted_limit)
+
+    def _get_bend_limits(self, doc, stickout, cutting_edge):
+        # Returns the limits of the shank and the fluted portion as a tuple
+        # of arrays.
+        # TODO: Estimate Yield for the fluted portion of the end mill separately
         tool_material = self.get_material()
-        cutting_edge = self.shape.get_cutting_edge() or stickout
         diameter = self.shape.get_diameter()
         shank_d = self.shape.get_shank_diameter() or diameter
         yield_strength = tool_material.yield_strength
-        shank_l = max(0.000001, stickout-cutting_edge)
-        non_cutting = max(0.000001, stickout-doc)
+        shank_l = np.maximum(0.000001, np.asarray(stickout-cutting_edge))
+        non_cutting = np.maximum(0.000001, np.asarray(stickout-doc))
         solid_inertia, fluted_inertia = self.get_inertia()
-        return min((yield_strength*solid_inertia) / ((shank_d/2)* shank_l),
-                   (yield_strength*fluted_inertia) / ((diameter/2) * non_cutting))
+        return ((yield_strength*solid_inertia) / ((shank_d/2)* shank_l),
+                (yield_strength*fluted_inertia) / ((diameter/2) * non_cutting))
 
     def get_twist_limit(self):
         """
@@ -410,3 +543,110 @@ class Tool(object):
             raise AttributeError("Cutting edge angle must be between 0 and 180 degrees")
         if cutting_edge <= 0:
             raise AttributeError(f"Cutting edge {cutting_edge} too small")
+
+
+def _unpickle_tool(tool):
+    # Pickled ToolProxy objects are restored as the Tool they stand for.
+    return tool
+
+class ToolProxy(object):
+    """
+    Stands in for a Tool of which only the header (label, summary and
+    icon) was loaded, e.g. for listing large libraries. The full Tool is
+    created by calling loader() on the first access to anything else,
+    after which the proxy forwards everything to it.
+    """
+    # Header fields that can be read and written without loading the tool.
+    header = 'label', 'filename'
+
+    def __init__(self, label, shape_name, summary, icon, loader, id, filename=None):
+        d = self.__dict__
+        d['id'] = id
+        d['label'] = label
+        d['filename'] = filename
+        d['shape_name'] = shape_name
+        d['summary'] = summary
+        d['icon'] = icon  # (icon_type, icon_bytes), shared with the shape
+        d['loader'] = loader
+        d['tool'] = None
+        d['loaded_label'] = None
+        d['loaded_state'] = None
+
+    def __str__(self):
+        return '{} "{}" "{}"'.format(self.id, self.label, self.shape_name)
+
+    def __eq__(self, other):
+        if other is None:
+            return False
+        return self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __getattr__(self, name):
+        # Only called for attributes that the proxy does not have. Private
+        # names are never forwarded, and neither is anything on a proxy
+        # that was created without __init__() (e.g. by copy or pickle
+        # probing for __setstate__), which would otherwise recurse.
+        if name.startswith('_') or 'tool' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        if self.tool is None and name in self.header:
+            self.__dict__[name] = value
+        else:
+            setattr(self.load(), name, value)
+
+    # Copies and pickles are made from the full tool.
+    def __copy__(self):
+        return copy(self.load())
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.load(), memo)
+
+    def __reduce__(self):
+        return _unpickle_tool, (self.load(),)
+
+    def is_loaded(self):
+        return self.tool is not None
+
+    def load(self):
+        if self.tool is not None:
+            return self.tool
+        tool = self.loader()
+        d = self.__dict__
+        d['loaded_label'] = tool.label
+        d['loaded_state'] = tool.get_state()
+
+        # Apply changes made to the header, and forward the header fields
+        # to the tool from now on.
+        for name in self.header:
+            setattr(tool, name, d.pop(name))
+        for name in ('summary', 'icon', 'loader'):
+            del d[name]
+        d['tool'] = tool
+        return tool
+
+    def get_label(self):
+        return self.label
+
+    def get_summary(self):
+        if self.tool is None:
+            return self.summary
+        return self.tool.get_summary()
+
+    def get_icon(self):
+        if self.tool is None:
+            return self.icon
+        return self.tool.get_icon()
+
+    def get_state(self):
+        # An unmodified tool must have the same state whether it was
+        # loaded or not, so that loading it is not mistaken for a change.
+        if self.tool is None:
+            return self.label,
+        state = self.tool.get_state()
+        if state == self.loaded_state:
+            return self.loaded_label,
+        return state
@@ -1,20 +1,30 @@
 import math
+import threading
 import matplotlib.pyplot as plt
 import numpy as np
 from PySide.QtCore import Qt, QPoint
 from PySide.QtGui import QImage, QPainter, QColor, QPainterPath
+from .feeds.util import get_tool_engagement_angles
 
 class ToolPixmap(object):
     def __init__(self,
-                 stickout,        # mm
-                 shank_diameter,  # mm
-                 diameter):       # mm
+                 stickout,           # mm
+                 shank_diameter,     # mm
+                 diameter,           # mm
+                 size=500,           # px
+                 interpolate=False):
         self.stickout = stickout
         self.shank_d = shank_diameter
         self.diameter = diameter
 
+        # If interpolate is True, overlap and effective diameter lookups
+        # interpolate between pixels instead of snapping to the pixel
+        # grid. This makes the result continuous in DOC and WOC, which
+        # the gradient based optimizer needs to make progress.
+        self.interpolate = interpolate
+
         # Prepare the surface.
-        self.size = 500
+        self.size = size
         self.scale = self.size/max(self.diameter, max(self.shank_d, self.stickout))
         self.S = lambda v: round(v*self.scale)
         self.image = QImage(self.size, self.size, QImage.Format_ARGB32)
@@ -35,7 +45,8 @@ class ToolPixmap(object):
         # Put differently: If the pixel at x/y contains the number 120, that
         # means: if the WOC reaches this pixel, then the overlap is 120.
         self.initialized = False
-        self.diameter_list = [0]*self.size
+        self.lock = threading.Lock()  # Guards building the tables
+        self.diameter_list = np.zeros(self.size)
         self.area = np.zeros((self.size+1, self.size+1))
 
     def paint(self):
@@ -83,69 +94,129 @@ class ToolPixmap(object):
 
     def _create_width_and_overlap_array(self):
         """
-        Returns a tuple (width_list, overlap), where
+        Populates self.diameter_list and self.area from the painted image:
 
-        - width_list is a list containing the width for each row of the shape.
-        - overlap is an array containing for each pixel the overlap at that position
+        - diameter_list contains the effective diameter for each row of the shape.
+        - area is an array containing for each pixel the overlap at that position
           of the tool.
           Put differently: If the pixel at x/y contains the number 120, that means: if
           the WOC reaches this pixel, then the overlap is 120.
         """
-        view = self.image.bits()
+        # Not every paint() implementation ends the painter, but the image
+        # must not be read while it is still being painted.
+        if self.painter.isActive():
+            self.painter.end()
+
         stride = self.image.bytesPerLine()
         pixel_area = (1 / self.scale) ** 2
-        xmax = 0
-        for y in range(self.size - 1, -1, -1):
-            lastArea = 0
-            for x in range(self.size - 1, -1, -1):
-                offset = (y * stride) + (x * 4)
-                alpha = view[offset + 3]
-                if alpha > 0:
-                    lastArea += pixel_area
-                    xmax = max(x, xmax)  # Record the widest point that we found a red pixel
-                # Set the overlap for this DOC/WOC combo
-                self.area[x, y] = lastArea + self.area[x, y + 1]
-    
-            # Assign the max diameter of the tool overlapping the workpiece as
-            # the effective diameter.
-            self.diameter_list[y] = 2 * ((xmax + 1) - (self.size / 2)) / self.scale
+        data = np.frombuffer(self.image.bits(), dtype=np.uint8)
+        data = data[:self.size*stride].reshape(self.size, stride)
+        mask = data[:, 3:self.size*4:4] > 0  # alpha channel, indexed [y, x]
+
+        # The overlap at x/y is the painted area right of x and below y,
+        # i.e. a suffix sum over both axes.
+        suffix = mask[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+        self.area[:self.size, :self.size] = suffix.T*pixel_area
+
+        # Record the widest point of each row that has a painted pixel, and
+        # use the widest point at or below each row as the effective diameter.
+        widest = self.size-1-np.argmax(mask[:, ::-1], axis=1)
+        widest = np.where(mask.any(axis=1), widest, 0)
+        xmax = np.maximum.accumulate(widest[::-1])[::-1]
+        self.diameter_list = 2 * ((xmax + 1) - (self.size / 2)) / self.scale
         self.initialized = True
 
+    def _init_tables(self):
+        # Pixmaps are cached in the tool and may be shared between
+        # threads (see btl.service), so the tables are built only once.
+        with self.lock:
+            if not self.initialized:
+                self._create_width_and_overlap_array()
+
     def get_effective_diameter_from_doc(self, doc):
         """
         Returns the tool diameter at the given depth of cut.
         """
         doc = max(0.000001, doc)
         if not self.initialized:
-            self._create_width_and_overlap_array()
-        scale = self.scale
-        lowY = self.stickout - doc
-        lowY = int(max(0, math.floor(lowY * scale)))
-        return self.diameter_list[lowY]
+            self._init_tables()
+        y = max(0, (self.stickout-doc)*self.scale)
+        lowY = min(int(y), self.size-1)
+        if not self.interpolate:
+            return self.diameter_list[lowY]
+
+        highY = min(lowY+1, self.size-1)
+        ty = y-lowY
+        return self.diameter_list[lowY]*(1-ty) + self.diameter_list[highY]*ty
 
     def get_overlap_from_woc(self, doc, woc):
         """
         Returns overlap in mm²
         """
-        doc = max(0.000001, doc)
-        woc = max(0.000001, woc)
-        if not self.initialized:
-            self._create_width_and_overlap_array()
+        return float(self.get_overlaps_from_wocs(doc, woc))
 
-        # Select appropriate integration limits
-        scale = self.scale
-        pixelArea = 1 / (scale * scale)
+    def get_effective_diameters_from_docs(self, docs):
+        """
+        Like get_effective_diameter_from_doc(), but takes an array of
+        depths of cut and returns an array of diameters.
+        """
+        docs = np.maximum(0.000001, np.asarray(docs, dtype=float))
+        if not self.initialized:
+            self._init_tables()
+        y = np.maximum(0, (self.stickout-docs)*self.scale)
+        lowY = np.minimum(y.astype(int), self.size-1)
+        if not self.interpolate:
+            return self.diameter_list[lowY]
 
-        # Calculate lowest X position.
-        diameter = self.get_effective_diameter_from_doc(doc)
-        lowX = diameter/2 - woc
-        lowX = int(max(0, math.floor(lowX*scale) + self.size/2))
+        highY = np.minimum(lowY+1, self.size-1)
+        ty = y-lowY
+        return self.diameter_list[lowY]*(1-ty) + self.diameter_list[highY]*ty
 
-        # Calculate lowest Y position.
-        lowY = self.stickout - doc
-        lowY = int(max(0, math.floor(lowY * scale)))
+    def get_overlaps_from_wocs(self, docs, wocs):
+        """
+        Like get_overlap_from_woc(), but takes arrays of DOC/WOC pairs
+        (broadcast against each other) and returns an array of overlaps
+        in mm².
+        """
+        docs, wocs = np.broadcast_arrays(np.asarray(docs, dtype=float),
+                                         np.asarray(wocs, dtype=float))
+        docs = np.maximum(0.000001, docs)
+        wocs = np.maximum(0.000001, wocs)
+        diameters = self.get_effective_diameters_from_docs(docs)
+        x = np.maximum(0, (diameters/2-wocs)*self.scale + self.size/2)
+        lowX = np.minimum(x.astype(int), self.size)
+        y = np.maximum(0, (self.stickout-docs)*self.scale)
+        lowY = np.minimum(y.astype(int), self.size)
+        if not self.interpolate:
+            return self.area[lowX, lowY]
+
+        # Bilinear interpolation between the four surrounding pixels.
+        # Since the overlap is an integral over the painted pixels, this
+        # is exact for any WOC or DOC that ends within a pixel.
+        highX = np.minimum(lowX+1, self.size)
+        highY = np.minimum(lowY+1, self.size)
+        tx = x-lowX
+        ty = y-lowY
+        area = self.area
+        return area[lowX, lowY]*(1-tx)*(1-ty) \
+             + area[highX, lowY]*tx*(1-ty) \
+             + area[lowX, highY]*(1-tx)*ty \
+             + area[highX, highY]*tx*ty
+
+    def get_engagement(self, docs, wocs):
+        """
+        Batched query for many DOC/WOC pairs in a single call.
 
-        return self.area[lowX][lowY]
+        Returns a tuple of arrays (overlaps, diameters, angles), where
+        overlaps are in mm², diameters are the effective diameters in mm
+        and angles are the tool engagement angles in degrees.
+        """
+        docs, wocs = np.broadcast_arrays(np.asarray(docs, dtype=float),
+                                         np.asarray(wocs, dtype=float))
+        diameters = self.get_effective_diameters_from_docs(docs)
+        overlaps = self.get_overlaps_from_wocs(docs, wocs)
+        angles = get_tool_engagement_angles(np.maximum(0.00001, wocs), diameters)
+        return overlaps, diameters, angles
 
 
 class EndmillPixmap(ToolPixmap):
@@ -153,8 +224,9 @@ class EndmillPixmap(ToolPixmap):
                  stickout,        # mm
                  shank_diameter,  # mm
                  diameter,        # mm
-                 cutting_edge):   # mm
-        super(EndmillPixmap, self).__init__(stickout, shank_diameter, diameter)
+                 cutting_edge,    # mm
+                 **kwargs):
+        super(EndmillPixmap, self).__init__(stickout, shank_diameter, diameter, **kwargs)
         self.cutting_edge = cutting_edge
         self.paint()
 
@@ -190,6 +262,12 @@ class EndmillPixmap(ToolPixmap):
         """
         return woc*doc
 
+    def get_effective_diameters_from_docs(self, docs):
+        return np.full(np.shape(docs), float(self.diameter))
+
+    def get_overlaps_from_wocs(self, docs, wocs):
+        return np.asarray(wocs, dtype=float)*np.asarray(docs, dtype=float)
+
 
 class ChamferPixmap(ToolPixmap):
     def __init__(self,
@@ -197,8 +275,9 @@ class ChamferPixmap(ToolPixmap):
                  shank_diameter,  # mm
                  diameter,        # mm
                  brim,            # mm
-                 radius):         # mm
-        super(ChamferPixmap, self).__init__(stickout, shank_diameter, diameter)
+                 radius,          # mm
+                 **kwargs):
+        super(ChamferPixmap, self).__init__(stickout, shank_diameter, diameter, **kwargs)
         self.brim = brim
         self.radius = radius
         self.tip_w = max(0, self.diameter-2*radius)
@@ -257,6 +336,9 @@ class ChamferPixmap(ToolPixmap):
         path.closeSubpath()
         self.painter.fillPath(path, QColor(77, 77, 77, 255))
 
+        # End the painting process
+        self.painter.end()
+
 
 class BullnosePixmap(ToolPixmap):
     def __init__(self,
@@ -264,8 +346,9 @@ class BullnosePixmap(ToolPixmap):
                  shank_diameter,   # mm
                  diameter,         # mm
                  cutting_edge,     # mm
-                 corner_radius=0): # mm
-        super(BullnosePixmap, self).__init__(stickout, shank_diameter, diameter)
+                 corner_radius=0,  # mm
+                 **kwargs):
+        super(BullnosePixmap, self).__init__(stickout, shank_diameter, diameter, **kwargs)
         self.cutting_edge = cutting_edge
 
         self.lead_angle = None
@@ -318,6 +401,9 @@ class BullnosePixmap(ToolPixmap):
                              self.S(self.corner_radius*2),
                              270*16, 90*16)
 
+        # End the painting process
+        self.painter.end()
+
 
 class VBitPixmap(ToolPixmap):
     def __init__(self,
@@ -326,8 +412,9 @@ class VBitPixmap(ToolPixmap):
                  diameter,        # mm
                  brim,            # mm
                  lead_angle=0,    # degrees (0-90)
-                 tip_w=0):        # mm
-        super(VBitPixmap, self).__init__(stickout, shank_diameter, diameter)
+                 tip_w=0,         # mm
+                 **kwargs):
+        super(VBitPixmap, self).__init__(stickout, shank_diameter, diameter, **kwargs)
         self.brim = brim
         self.lead_angle = lead_angle
         self.tip_w = tip_w
@@ -377,15 +464,60 @@ class VBitPixmap(ToolPixmap):
             self.painter.setPen(Qt.NoPen)  # Set the pen width to zero (no border)
             self.painter.drawPath(path)
 
+        # End the painting process
+        self.painter.end()
+
 class DrillPixmap(VBitPixmap):
     def __init__(self,
                  stickout,        # mm
                  diameter,        # mm
                  angle=119,       # degrees (0-180)
-                 tip_w=0.0001):   # mm
+                 tip_w=0.0001,    # mm
+                 **kwargs):
         super(DrillPixmap, self).__init__(stickout,
                                           diameter,
                                           diameter,
                                           0,
                                           angle/2,
-                                          tip_w)
+                                          tip_w,
+                                          **kwargs)
+
+class ProfilePixmap(ToolPixmap):
+    """
+    A pixmap for any tool that can be described by a ToolProfile. The
+    image is only used for display; all engagement queries are answered
+    exactly by the profile.
+    """
+    def __init__(self, profile, **kwargs):
+        super(ProfilePixmap, self).__init__(profile.stickout,
+                                            profile.shank_d,
+                                            profile.diameter,
+                                            **kwargs)
+        self.profile = profile
+        self.initialized = True  # No need to build lookup tables
+        self.paint()
+
+    def paint(self):
+        center_x = self.size/2/self.scale
+        points = list(zip(self.profile.r, self.profile.z))
+        path = QPainterPath()
+        path.moveTo(self.S(center_x+points[0][0]), self.S(self.stickout-points[0][1]))
+        for r, z in points[1:]:
+            path.lineTo(self.S(center_x+r), self.S(self.stickout-z))
+        for r, z in reversed(points):
+            path.lineTo(self.S(center_x-r), self.S(self.stickout-z))
+        path.closeSubpath()
+        self.painter.fillPath(path, QColor(26, 26, 26))
+        self.painter.end()
+
+    def get_effective_diameter_from_doc(self, doc):
+        return self.profile.get_effective_diameter_from_doc(doc)
+
+    def get_overlap_from_woc(self, doc, woc):
+        return self.profile.get_overlap_from_woc(doc, woc)
+
+    def get_effective_diameters_from_docs(self, docs):
+        return self.profile.get_effective_diameters_from_docs(docs)
+
+    def get_overlaps_from_wocs(self, docs, wocs):
+        return self.profile.get_overlaps_from_wocs(docs, wocs)
@@ -0,0 +1,343 @@
+import math
+import numpy as np
+from bisect import bisect_right
+from .feeds.util import get_tool_engagement_angles
+from .params import DistanceParam
+
+class Arc(object):
+    """
+    A circular arc in the side profile of a tool, to be used in the point
+    list of a ToolProfile.
+
+    Angles are in degrees and are measured counter-clockwise from the
+    radial axis, i.e. -90 is the bottom of the circle and 0 is the point
+    furthest away from the tool axis.
+    """
+    def __init__(self,
+                 center_r,     # mm
+                 center_z,     # mm
+                 radius,       # mm
+                 start_angle,  # degrees
+                 end_angle,    # degrees
+                 segments=16):
+        self.center_r = center_r
+        self.center_z = center_z
+        self.radius = radius
+        self.start_angle = start_angle
+        self.end_angle = end_angle
+        self.segments = segments
+
+    def to_points(self):
+        points = []
+        step = (self.end_angle-self.start_angle)/self.segments
+        for i in range(self.segments+1):
+            angle = math.radians(self.start_angle+i*step)
+            points.append((self.center_r+self.radius*math.cos(angle),
+                           self.center_z+self.radius*math.sin(angle)))
+        return points
+
+class ToolProfile(object):
+    """
+    Describes a rotationally symmetric tool by its side profile, and
+    answers the same engagement queries as a ToolPixmap, but computed
+    exactly from the geometry instead of from a rendered image.
+
+    The profile is a list of (radius, height) points, or Arc objects,
+    where the height is measured from the tip of the tool upwards. The
+    height must never decrease along the list. If a stickout is given,
+    the last point is extended up to the stickout.
+    """
+    def __init__(self, points, stickout=None, cutting_edge=None):
+        self.cutting_edge = cutting_edge
+
+        polyline = []
+        for point in points:
+            if isinstance(point, Arc):
+                polyline += point.to_points()
+            else:
+                polyline.append(point)
+        if stickout is not None and polyline[-1][1] < stickout:
+            polyline.append((polyline[-1][0], stickout))
+
+        r = np.array([max(0, p[0]) for p in polyline], dtype=float)
+        z = np.array([p[1] for p in polyline], dtype=float)
+        if np.any(np.diff(z) < 0):
+            raise AttributeError('tool profile height must not decrease')
+        self.r = r
+        self.z = z
+        self.stickout = z[-1]
+        self.diameter = 2*r.max()
+        self.shank_d = 2*r[-1]
+
+        # Per-DOC index: For each point of the profile, the integral of
+        # the radius over the height up to that point (i.e. half of the
+        # silhouette area), and the widest radius up to that point.
+        # These allow for answering full-width queries by bisection.
+        self.prefix_area = np.concatenate(([0], np.cumsum((r[1:]+r[:-1])/2*np.diff(z))))
+        self.prefix_r = np.maximum.accumulate(r)
+        self._z_list = z.tolist()
+
+    def get_radius_at(self, z):
+        return float(np.interp(z, self.z, self.r))
+
+    def _index_from_doc(self, doc):
+        doc = min(max(0, doc), self.stickout)
+        return max(0, bisect_right(self._z_list, doc)-1), doc
+
+    def _get_max_radius_from_doc(self, doc):
+        index, doc = self._index_from_doc(doc)
+        return max(self.prefix_r[index], self.get_radius_at(doc))
+
+    def _get_area_beyond(self, docs, offsets):
+        """
+        Returns the integral of max(0, r-offset) over the height 0..doc,
+        i.e. the area of the profile beyond the given offset from the
+        tool axis. Takes arrays of equal shape.
+        """
+        docs = docs[..., np.newaxis]
+        offsets = offsets[..., np.newaxis]
+
+        # Clip each segment at the DOC.
+        z0, z1 = self.z[:-1], self.z[1:]
+        r0, r1 = self.r[:-1], self.r[1:]
+        top = np.minimum(z1, docs)
+        length = np.maximum(0, top-z0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(z1 > z0, length/(z1-z0), 0)
+        a = r0-offsets
+        b = r0+(r1-r0)*fraction-offsets
+
+        # Integrate the positive part of the (linear) distance a..b.
+        both = length*(a+b)/2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            partial = length*np.maximum(a, b)**2/(2*np.abs(a-b))
+        area = np.where((a >= 0) & (b >= 0), both,
+                        np.where((a <= 0) & (b <= 0), 0, partial))
+        return area.sum(axis=-1)
+
+    def get_effective_diameter_from_doc(self, doc):
+        """
+        Returns the tool diameter at the given depth of cut.
+        """
+        return 2*self._get_max_radius_from_doc(max(0.000001, doc))
+
+    def get_overlap_from_woc(self, doc, woc):
+        """
+        Returns overlap in mm²
+        """
+        overlap = self.get_overlaps_from_wocs(doc, woc)
+        return float(overlap)
+
+    def get_effective_diameters_from_docs(self, docs):
+        """
+        Like get_effective_diameter_from_doc(), but takes an array of
+        depths of cut and returns an array of diameters.
+        """
+        docs = np.clip(np.asarray(docs, dtype=float), 0.000001, self.stickout)
+        index = np.searchsorted(self.z, docs, side='right')-1
+        radius = np.interp(docs, self.z, self.r)
+        return 2*np.maximum(self.prefix_r[index], radius)
+
+    def get_overlaps_from_wocs(self, docs, wocs):
+        """
+        Like get_overlap_from_woc(), but takes arrays of DOC/WOC pairs
+        (broadcast against each other) and returns an array of overlaps
+        in mm². Unlike full-width queries, each pair takes O(n) in the
+        number of profile points, as the area beyond the cut offset has
+        no prefix sum.
+        """
+        docs, wocs = np.broadcast_arrays(np.asarray(docs, dtype=float),
+                                         np.asarray(wocs, dtype=float))
+        docs = np.clip(docs, 0.000001, self.stickout)
+        wocs = np.maximum(0.000001, wocs)
+
+        # The cut begins at "offset" from the tool axis, and extends to
+        # the effective radius.
+        radius = self.get_effective_diameters_from_docs(docs)/2
+        offsets = radius-wocs
+
+        # If the offset is positive, the overlap is the area of the
+        # profile beyond the offset. Otherwise the cut reaches past the
+        # tool axis, and includes the full width of the silhouette minus
+        # what lies beyond the offset on the other side.
+        beyond = self._get_area_beyond(docs, np.abs(offsets))
+        index = np.searchsorted(self.z, docs, side='right')-1
+        r0 = self.r[index]
+        r1 = np.interp(docs, self.z, self.r)
+        half_area = self.prefix_area[index] + (r0+r1)/2*(docs-self.z[index])
+        return np.where(offsets >= 0, beyond, 2*half_area-beyond)
+
+    def get_engagement(self, docs, wocs):
+        """
+        Batched query for many DOC/WOC pairs in a single call.
+
+        Returns a tuple of arrays (overlaps, diameters, angles), where
+        overlaps are in mm², diameters are the effective diameters in mm
+        and angles are the tool engagement angles in degrees.
+        """
+        docs, wocs = np.broadcast_arrays(np.asarray(docs, dtype=float),
+                                         np.asarray(wocs, dtype=float))
+        diameters = self.get_effective_diameters_from_docs(docs)
+        overlaps = self.get_overlaps_from_wocs(docs, wocs)
+        angles = get_tool_engagement_angles(np.maximum(0.00001, wocs), diameters)
+        return overlaps, diameters, angles
+
+def _get(shape, name, default=0):
+    param = shape.get_param(name)
+    if param is None or not param.v:
+        return default
+    if isinstance(param, DistanceParam):
+        return param.value('mm')
+    return float(param.v)
+
+def _cylinder(shape, tip_points, cutting_edge=None):
+    # Extends the given tip with a cylinder of the tool diameter up to
+    # the end of the cutting edge, followed by the shank.
+    radius = _get(shape, 'Diameter')/2
+    cutting_edge = cutting_edge or _get(shape, 'CuttingEdgeHeight')
+    shank_r = _get(shape, 'ShankDiameter', radius*2)/2
+    cutting_edge = max(cutting_edge, tip_points[-1][1])
+    points = tip_points + [(radius, cutting_edge), (shank_r, cutting_edge)]
+    return points, cutting_edge
+
+def _flat_end_mill(shape):
+    radius = _get(shape, 'Diameter')/2
+    return _cylinder(shape, [(0, 0), (radius, 0)])
+
+def _ball_end_mill(shape):
+    radius = _get(shape, 'Diameter')/2
+    return _cylinder(shape, [Arc(0, radius, radius, -90, 0), (radius, radius)])
+
+def _bull_nose_end_mill(shape):
+    radius = _get(shape, 'Diameter')/2
+    corner_r = min(radius, _get(shape, 'TorusRadius'))
+    return _cylinder(shape, [(0, 0),
+                             Arc(radius-corner_r, corner_r, corner_r, -90, 0),
+                             (radius, corner_r)])
+
+def _chamfer_mill(shape):
+    radius = _get(shape, 'Diameter')/2
+    tip_r = _get(shape, 'TipDiameter')/2
+    angle = _get(shape, 'TipAngle', 90)
+    height = (radius-tip_r)/math.tan(math.radians(angle/2))
+    return _cylinder(shape, [(0, 0), (tip_r, 0), (radius, height)])
+
+def _tapered_mill(shape):
+    radius = _get(shape, 'Diameter')/2
+    corner_r = min(radius, _get(shape, 'TorusRadius'))
+    angle = _get(shape, 'TaperAngle')
+    cutting_edge = max(corner_r, _get(shape, 'CuttingEdgeHeight'))
+    top_r = radius+(cutting_edge-corner_r)*math.tan(math.radians(angle))
+    shank_r = _get(shape, 'ShankDiameter', top_r*2)/2
+    points = [(0, 0),
+              Arc(radius-corner_r, corner_r, corner_r, -90, 0),
+              (radius, corner_r),
+              (top_r, cutting_edge),
+              (shank_r, cutting_edge)]
+    return points, cutting_edge
+
+def _slot_mill(shape):
+    radius = _get(shape, 'Diameter')/2
+    cutting_edge = _get(shape, 'CuttingEdgeHeight')
+    corner_r = min(radius, cutting_edge/2, _get(shape, 'CornerRadius'))
+    shank_r = _get(shape, 'ShankDiameter', radius*2)/2
+    points = [(0, 0),
+              Arc(radius-corner_r, corner_r, corner_r, -90, 0),
+              Arc(radius-corner_r, cutting_edge-corner_r, corner_r, 0, 90),
+              (radius-corner_r, cutting_edge),
+              (shank_r, cutting_edge)]
+    return points, cutting_edge
+
+def _dovetail(shape):
+    # The cutting angle is measured between the flank and the tool axis.
+    radius = _get(shape, 'Diameter')/2
+    height = _get(shape, 'DovetailHeight') or _get(shape, 'CuttingEdgeHeight')
+    crest = _get(shape, 'Crest')
+    angle = _get(shape, 'CuttingAngle', 45)
+    neck_r = _get(shape, 'NeckDiameter')/2
+    top_r = radius-(height-crest)*math.tan(math.radians(angle))
+    top_r = max(neck_r, top_r, 0)
+    neck_length = _get(shape, 'NeckLength')
+    shank_r = _get(shape, 'ShankDiameter', radius*2)/2
+    points = [(0, 0),
+              (radius, 0),
+              (radius, crest),
+              (top_r, height),
+              (neck_r or top_r, height),
+              (neck_r or top_r, max(height, neck_length)),
+              (shank_r, max(height, neck_length))]
+    return points, height
+
+def _threadmill(shape):
+    # A single form thread mill; the cutting angle is the included angle
+    # of the thread form.
+    radius = _get(shape, 'Diameter')/2
+    crest = _get(shape, 'Crest')
+    angle = _get(shape, 'cuttingAngle', 60)
+    neck_r = _get(shape, 'NeckDiameter', radius*2)/2
+    flank = (radius-neck_r)*math.tan(math.radians(angle/2))
+    height = 2*flank+crest
+    neck_top = height+_get(shape, 'NeckLength')
+    shank_r = _get(shape, 'ShankDiameter', radius*2)/2
+    points = [(0, 0),
+              (neck_r, 0),
+              (radius, flank),
+              (radius, flank+crest),
+              (neck_r, height),
+              (neck_r, neck_top),
+              (shank_r, neck_top)]
+    return points, height
+
+def _lollipop(shape):
+    radius = _get(shape, 'Diameter')/2
+    shank_r = min(radius, _get(shape, 'ShankDiameter', radius)/2)
+    top = radius+math.sqrt(radius**2-shank_r**2)
+    end_angle = math.degrees(math.asin((top-radius)/radius))
+    points = [Arc(0, radius, radius, -90, end_angle),
+              (shank_r, top)]
+    return points, radius*2
+
+# Maps a shape name to a function that returns a tuple (points, cutting_edge)
+# describing the side profile of a tool with that shape.
+profile_builders = {
+    'dovetail': _dovetail,
+    'threadmill': _threadmill,
+    '_fusion_flat_end_mill': _flat_end_mill,
+    '_fusion_ball_end_mill': _ball_end_mill,
+    '_fusion_bull_nose_end_mill': _bull_nose_end_mill,
+    '_fusion_face_mill': _bull_nose_end_mill,
+    '_fusion_chamfer_mill': _chamfer_mill,
+    '_fusion_dovetail_mill': _dovetail,
+    '_fusion_lollipop_mill': _lollipop,
+    '_fusion_slot_mill': _slot_mill,
+    '_fusion_tapered_mill': _tapered_mill,
+}
+
+def has_profile(shape):
+    return shape.name in profile_builders
+
+def _build_profile(shape):
+    # Returns (points, cutting_edge), or None if the shape is not supported
+    # or its params do not describe a valid tool (e.g. a diameter of 0).
+    builder = profile_builders.get(shape.name)
+    if builder is None:
+        return None
+    try:
+        return builder(shape)
+    except (ArithmeticError, ValueError):
+        return None
+
+def get_profile_cutting_edge(shape):
+    profile = _build_profile(shape)
+    return profile[1] if profile else None
+
+def get_profile_from_shape(shape, stickout=None):
+    """
+    Returns a ToolProfile for the given shape, or None if the shape is
+    not supported or its params do not describe a valid tool.
+    """
+    profile = _build_profile(shape)
+    if profile is None:
+        return None
+    points, cutting_edge = profile
+    return ToolProfile(points, stickout, cutting_edge)
@@ -346,7 +346,7 @@ class FeedsAndSpeedsWidget(QtGui.QWidget):
         if not editor.exec():
             return
         self.db.add_machine(machine)
-        self.db.serialize_machines(self.serializer)
+        self.db.save_changes(self.serializer)
         self.update()
 
     def _on_new_machine_clicked(self):
@@ -113,7 +113,7 @@ class LibraryUI():
             tool = item.data(QtCore.Qt.UserRole)
             self.db.add_tool(tool.copy(), library)
 
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def _paste_tool(self):
@@ -133,7 +133,7 @@ class LibraryUI():
             if tool and not library.has_tool(tool):
                 self.db.add_tool(tool, library)
 
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def on_right_click(self, pos):
@@ -163,9 +163,10 @@ class LibraryUI():
         for tool in tools:
             self.db.add_tool(tool, dialog.library)
             if library:
+                dialog.library.set_pocket(tool, library.get_pocket(tool))
                 library.remove_tool(tool)
 
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def update_button_state(self):
@@ -186,7 +187,7 @@ class LibraryUI():
         self.form.pushButtonAddToJob.setToolTip(tt)
 
     def load(self):
-        self.db.deserialize(self.serializer)
+        self.db.deserialize(self.serializer, lazy=True)
 
         # Update the library dropdown menu.
         combo = self.form.comboBoxLibrary
@@ -229,13 +230,13 @@ class LibraryUI():
         for tool in sorted(tools, key=lambda x: x.label, reverse=True):
             cell = TwoLineTableCell()
             cell.set_upper_text(tool.label)
-            cell.set_lower_text(tool.shape.get_param_summary())
-            cell.set_icon_from_shape(tool.shape)
+            cell.set_lower_text(tool.get_summary())
+            cell.set_icon_from_data(*tool.get_icon())
 
             if library:
                 tool_no = library.get_tool_no_from_tool(tool)
                 cell.set_tool_no(tool_no)
-                cell.set_pocket(tool.pocket)
+                cell.set_pocket(library.get_pocket(tool))
 
             widget_item = QtGui.QListWidgetItem(listwidget)
             widget_item.setSizeHint(cell.sizeHint())
@@ -266,7 +267,7 @@ class LibraryUI():
             return
 
         self.db.add_library(library)
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def on_edit_library_clicked(self):
@@ -278,7 +279,7 @@ class LibraryUI():
         if dialog.exec() != QtGui.QDialog.Accepted:
             return
 
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def on_delete_library_clicked(self):
@@ -302,7 +303,7 @@ class LibraryUI():
 
         self.db.remove_library(library)
         self.form.comboBoxLibrary.setCurrentIndex(0)
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def _get_pattern_for_serializer(self, serializer):
@@ -345,7 +346,7 @@ class LibraryUI():
         cur_library = self.get_selected_library()
         for tool in library:
             self.db.add_tool(tool, cur_library)
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def _get_library_serializer_filters(self):
@@ -408,7 +409,8 @@ class LibraryUI():
         self.db.add_tool(tool, library)
         if library:
             library.assign_new_tool_no(tool, editor.tool_no)
-        self.db.serialize(self.serializer)
+            library.set_pocket(tool, editor.pocket)
+        self.db.save_changes(self.serializer)
         self.load()
         self.select_tool(tool)
 
@@ -440,7 +442,8 @@ class LibraryUI():
         library = self.get_selected_library()
         if library:
             tool_no = library.get_tool_no_from_tool(tool)
-            editor = ToolEditor(self.db, self.serializer, tool, tool_no)
+            pocket = library.get_pocket(tool)
+            editor = ToolEditor(self.db, self.serializer, tool, tool_no, pocket)
         else:
             editor = ToolEditor(self.db, self.serializer, tool)
 
@@ -453,8 +456,9 @@ class LibraryUI():
         self.db.add_tool(tool)
         if library:
             library.assign_new_tool_no(tool, editor.tool_no)
+            library.set_pocket(tool, editor.pocket)
 
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
         self.select_tool(tool)
 
@@ -498,7 +502,7 @@ class LibraryUI():
             tool = item.data(QtCore.Qt.UserRole)
             self.db.remove_tool(tool, library)
 
-        self.db.serialize(self.serializer)
+        self.db.save_changes(self.serializer)
         self.load()
 
     def on_import_shape_clicked(self):
@@ -76,7 +76,7 @@ class MachineEditor(QtGui.QWidget):
 
     def _on_delete_clicked(self):
         self.db.remove_machine(self.machine)
-        self.db.serialize_machines(self.serializer)
+        self.db.save_changes(self.serializer)
         self.update()
         self.form.reject()
 
@@ -112,7 +112,9 @@ class TwoLineTableCell(QtGui.QWidget):
         self.hbox.insertWidget(1, self.icon_widget, 0)
 
     def set_icon_from_shape(self, shape):
-        icon_type, icon_bytes = shape.get_icon()
+        self.set_icon_from_data(*shape.get_icon())
+
+    def set_icon_from_data(self, icon_type, icon_bytes):
         if not icon_type:
             return
         icon_ba = QtCore.QByteArray(icon_bytes)
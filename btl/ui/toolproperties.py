@@ -98,8 +98,9 @@ class PropertyWidget(QtGui.QWidget):
 
 class ToolProperties(PropertyWidget):
     toolNoChanged = QtCore.Signal(int)
+    pocketChanged = QtCore.Signal(int)
 
-    def __init__ (self, tool, tool_no=None, parent=None):
+    def __init__ (self, tool, tool_no=None, pocket=None, parent=None):
         super(ToolProperties, self).__init__(parent)
         self.tool = tool
         self.tool_no = tool_no
@@ -129,13 +130,14 @@ class ToolProperties(PropertyWidget):
             lbl = translate('btl', 'Tool Number')
             self._add_property_from_widget(spinner, lbl, self.tool_no)
 
-        spinner = QtGui.QSpinBox()
-        spinner.setValue(tool.pocket or 0)
-        spinner.setMaximum(99999999)
-        spinner.setSpecialValueText(translate('btl', 'None'))
-        spinner.valueChanged.connect(tool.set_pocket)
-        lbl = translate('btl', 'Pocket')
-        self._add_property_from_widget(spinner, lbl, self.tool.pocket)
+            # The pocket is stored in the library, like the tool number.
+            spinner = QtGui.QSpinBox()
+            spinner.setValue(pocket or 0)
+            spinner.setMaximum(99999999)
+            spinner.setSpecialValueText(translate('btl', 'None'))
+            spinner.valueChanged.connect(self.pocketChanged.emit)
+            lbl = translate('btl', 'Pocket')
+            self._add_property_from_widget(spinner, lbl, pocket)
         self._makespacing(6)
 
         # Add well-known properties under a separate title.
@@ -1,4 +1,5 @@
 import re
+import numpy as np
 
 meters_to_inch = 39.37007874
 meters_to_feet = 3.280839895
@@ -176,20 +177,23 @@ def _exponent_replace(match):
     # Replaces exponents by UTF superscript ones.
     return _exponent_map[match.group(1)]
 
+_symbol_re = re.compile('^('+'|'.join(_symbols.keys())+')')
+_exponent_re = re.compile(r'\^?(\d)')
+_one_exponent_re = re.compile(r'^([μa-z]+)¹$')
 def _base_unit_normalize(unit):
     assert '/' not in unit
-    inputs = '|'.join(_symbols.keys())
-    unit = re.sub(f'^({inputs})', _symbol_replace, unit)
-    unit = re.sub(r'\^?(\d)', _exponent_replace, unit)
-    return re.sub(r'^([μa-z]+)¹$', r'\1', unit) # strip "1" exponent
+    unit = _symbol_re.sub(_symbol_replace, unit)
+    unit = _exponent_re.sub(_exponent_replace, unit)
+    return _one_exponent_re.sub(r'\1', unit) # strip "1" exponent
 
 def unit_normalize(unit):
     base_unit, suffix = _suffix_split(unit)
     base_unit = _base_unit_normalize(base_unit)
     return base_unit+'/'+suffix if suffix else base_unit
 
+_split_exponent_re = re.compile(r'^([μa-z-]+)([⁰¹²³⁴⁵⁶⁷⁸⁹]*)$', re.I)
 def _split_exponent(unit):
-    match = re.match(r'^([μa-z]+)([⁰¹²³⁴⁵⁶⁷⁸⁹]*)$', unit, re.I)
+    match = _split_exponent_re.match(unit)
     return match.group(1), match.group(2)
 
 def get_default_unit_conversion(unit):
@@ -202,10 +206,11 @@ def _superscript_replace(match):
     # Replaces exponents by UTF superscript ones.
     return _rev_exponent_map[match.group(1)]
 
+_superscript_re = re.compile(r'([⁰¹²³⁴⁵⁶⁷⁸⁹])')
 def _superscript2int(string):
     if not string:
         return None
-    intstr = re.sub(r'([⁰¹²³⁴⁵⁶⁷⁸⁹])', _superscript_replace, string)
+    intstr = _superscript_re.sub(_superscript_replace, string)
     try:
         return int(intstr)
     except ValueError:
@@ -218,10 +223,12 @@ def parse_value(value):
     value, unit = _value_split_re.match(value).groups()
     return float(value), unit_normalize(unit) or None
 
-def convert(value, source_unit, dest_unit=None):
-    if source_unit == dest_unit:   # Exists for performance reasons.
-        return value, source_unit
-
+def _compile_conversion(source_unit, dest_unit):
+    """
+    Resolves a conversion from source_unit to dest_unit into a tuple
+    (factor, unit), where factor is the number to multiply the value
+    with, and unit is the normalized destination unit.
+    """
     # Normalize the source unit.
     source_base_unit, source_suffix = _suffix_split(source_unit)
     source_base_unit = _base_unit_normalize(source_base_unit)
@@ -255,9 +262,93 @@ def convert(value, source_unit, dest_unit=None):
     if factor is None:
         raise AttributeError(f'unsupported: "{source_unit}" to "{dest_unit}"')
 
-    return value*10**source_exponent_int*factor**dest_exponent_int/10**dest_exponent_int, \
+    return 10**source_exponent_int*factor**dest_exponent_int/10**dest_exponent_int, \
            dest_base_unit+(dest_exponent or '')+suffix
 
+# Maps (source_unit, dest_unit) to the (factor, unit) tuple returned by
+# _compile_conversion(), so each pair of units is only parsed once.
+_conversions = {}
+
+def convert(value, source_unit, dest_unit=None):
+    if source_unit == dest_unit:   # Exists for performance reasons.
+        return value, source_unit
+
+    key = source_unit, dest_unit
+    conversion = _conversions.get(key)
+    if conversion is None:
+        conversion = _conversions[key] = _compile_conversion(source_unit, dest_unit)
+    factor, unit = conversion
+    return value*factor, unit
+
+class Quantity(object):
+    """
+    A NumPy array of values that share a unit. Converting a Quantity
+    converts all values in a single multiplication, so e.g. the diameters
+    of all tools in a library can be shown in imperial units at once.
+    """
+    def __init__(self, values, unit):
+        self.values = np.asarray(values, dtype=float)
+        self.unit = unit
+
+    @classmethod
+    def from_params(cls, params, unit=None):
+        """
+        Collects the values of the given NumericParams into a Quantity
+        in the given unit. If no unit is given, the unit of the first
+        param is used. Params without a value (or None in place of a
+        param) become NaN.
+        """
+        params = list(params)
+        if unit is None:
+            unit = next((p.unit for p in params if p is not None), None)
+
+        # Group the params by their unit, so that each group is converted
+        # in one operation.
+        groups = {}
+        for i, param in enumerate(params):
+            if param is not None and param.v is not None:
+                groups.setdefault(param.unit, []).append(i)
+
+        values = np.full(len(params), np.nan)
+        for source_unit, indices in groups.items():
+            group = np.array([params[i].v for i in indices], dtype=float)
+            if source_unit and unit:
+                group, _ = convert(group, source_unit, unit)
+            values[indices] = group
+        return cls(values, unit)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, key):
+        return Quantity(self.values[key], self.unit)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __repr__(self):
+        return f'Quantity({self.values!r}, {self.unit!r})'
+
+    def to(self, unit=None):
+        """
+        Returns a new Quantity converted to the given unit. If no unit
+        is given, the default imperial unit is used.
+        """
+        values, unit = convert(self.values, self.unit, unit)
+        return Quantity(values, unit)
+
+    def value(self, unit=None):
+        """
+        Returns the values as an array in the given unit.
+        """
+        if unit is None or not self.unit:
+            return self.values
+        return convert(self.values, self.unit, unit)[0]
+
+    def get_imperial(self, unit=None):
+        """Returns a tuple (values, unit)"""
+        return convert(self.values, self.unit, unit)
+
 if __name__ == '__main__':
     import sys
 
@@ -11,6 +11,17 @@ def sha256sum(filename):
             h.update(mv[:n])
     return h.hexdigest()
 
+def get_file_fingerprint(filename):
+    """
+    Returns a list [mtime_ns, size, inode] that changes whenever the
+    file is modified or replaced, or None if the file does not exist.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
 def file_is_newer(reference, file):
     return os.path.getmtime(reference) < os.path.getmtime(file)
 
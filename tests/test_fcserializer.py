@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+from btl import ToolDB
+from btl.serializers.fcserializer import FCSerializer
+
+tool_dir = os.path.join(os.path.dirname(__file__), 'tools')
+
+class FCSerializerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tools')
+        shutil.copytree(tool_dir, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def load(self, lazy=False):
+        db = ToolDB()
+        db.deserialize(FCSerializer(self.path), lazy=lazy)
+        return db
+
+class LoadIndexTest(FCSerializerTestCase):
+    def test_index_matches_decoded(self):
+        # The first load decodes the tool files and writes the index, the
+        # second one loads the tools from the index.
+        decoded = self.load()
+        self.assertTrue(os.path.exists(os.path.join(self.path, '.btl-index.json')))
+        indexed = self.load()
+
+        tools = {t.id: t for t in indexed.get_tools()}
+        self.assertTrue(decoded.get_tools())
+        for tool in decoded.get_tools():
+            other = tools[tool.id]
+            self.assertEqual(tool.get_state(), other.get_state())
+            for name, param in tool.shape.params.items():
+                self.assertEqual(param_fields(param),
+                                 param_fields(other.shape.params[name]))
+            for name, param in tool.attrs.items():
+                self.assertEqual(param_fields(param),
+                                 param_fields(other.attrs[name]))
+
+def param_fields(param):
+    return (type(param), param.name, param.label, param.v, param.unit,
+            param.group, param.choices, getattr(param, 'min', None),
+            getattr(param, 'max', None), getattr(param, 'limit', None),
+            getattr(param, 'decimals', None))
+
+if __name__ == '__main__':
+    unittest.main()
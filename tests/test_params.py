@@ -0,0 +1,46 @@
+import copy
+import unittest
+from btl.params import Param, DistanceParam, \
+                       param_to_record, param_from_record
+
+def get_slots(param):
+    return {name: getattr(param, name)
+            for klass in type(param).__mro__
+            for name in getattr(klass, '__slots__', ())}
+
+class ParamRecordTest(unittest.TestCase):
+    def test_round_trip(self):
+        param = DistanceParam(min=1, max=20, decimals=2, v=6.5, name='Diameter')
+        param.set_limit(10)
+        param.label = 'Tool diameter'
+        param.group = 'Shape'
+        restored = param_from_record(param_to_record(param))
+        self.assertIs(type(restored), DistanceParam)
+        self.assertEqual(get_slots(restored), get_slots(param))
+
+    def test_round_trip_choices(self):
+        param = Param('Material', v='Carbide')
+        param.choices = ['Carbide', 'HSS']
+        restored = param_from_record(param_to_record(param))
+        self.assertEqual(get_slots(restored), get_slots(param))
+
+    def test_old_record(self):
+        # Records without the label and numeric fields get the defaults.
+        record = ['IntParam', 'Flutes', 3, '', 'Shape', None]
+        param = param_from_record(record)
+        self.assertEqual(param.v, 3)
+        self.assertEqual(param.label, 'Flutes')
+        self.assertIsNone(param.max)
+
+class ParamCopyTest(unittest.TestCase):
+    def test_deepcopy_does_not_share_lists(self):
+        param = Param('Material', v=['Carbide'])
+        param.choices = ['Carbide', 'HSS']
+        clone = copy.deepcopy(param)
+        clone.choices.append('Ceramic')
+        clone.v.append('HSS')
+        self.assertEqual(param.choices, ['Carbide', 'HSS'])
+        self.assertEqual(param.v, ['Carbide'])
+
+if __name__ == '__main__':
+    unittest.main()
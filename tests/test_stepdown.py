@@ -0,0 +1,46 @@
+import unittest
+from btl.feeds import FeedCalc, operation
+from btl.feeds.benchmark import create_tool, get_machines
+from btl.feeds.material import materials
+from btl.feeds.stepdown import StepdownPlanner
+
+material = [m for m in materials if m.id == 'Aluminium6061'][0]
+
+class CutLimitsTest(unittest.TestCase):
+    def test_estimate_matches_feedcalc(self):
+        # estimate() uses Operation.get_cut_limits(), plan() runs FeedCalc,
+        # which uses Operation.optimize_cut(). Both must set the same limits.
+        machine = get_machines()[0]
+        for shape_name in ('endmill', 'torus', 'ballend', 'vbit', 'chamfer', 'dovetail'):
+            tool = create_tool(shape_name)
+            pixmap = tool.get_pixmap()
+            for op in (operation.Profiling, operation.HSM):
+                fc = FeedCalc(machine, tool, material, op=op)
+                for doc, woc in ((0.3, 0.5), (0.8, 5.5), (2, 1), (5, 3)):
+                    with self.subTest(shape=shape_name, op=op.__name__, doc=doc, woc=woc):
+                        fc.reset_limits()
+                        fc.doc.v, fc.woc.v = doc, woc
+                        fc.speed.v, fc.chipload.v = 100, 0.01
+                        fc.update()
+
+                        diameter = pixmap.get_effective_diameter_from_doc(doc)
+                        speed, chipload, feed_factor = op.get_cut_limits(
+                            tool, material, doc, woc, diameter)
+                        self.assertAlmostEqual(min(float(speed), fc.speed.max),
+                                               fc.speed.limit)
+                        self.assertAlmostEqual(float(chipload), fc.chipload.limit)
+                        self.assertAlmostEqual(float(feed_factor), fc.feed_factor.v)
+
+class StepdownPlannerTest(unittest.TestCase):
+    def test_plan_refines_estimate(self):
+        tool = create_tool('torus')
+        planner = StepdownPlanner(get_machines()[0], tool, material,
+                                  op=operation.HSM, refine=1)
+        estimate = planner.estimate(10, max_passes=2)[0]
+        plan = planner.plan(10, max_passes=2)[0]
+        self.assertEqual(plan.passes, estimate.passes)
+        self.assertAlmostEqual(plan.doc, estimate.doc)
+        self.assertTrue(plan.is_valid())
+
+if __name__ == '__main__':
+    unittest.main()
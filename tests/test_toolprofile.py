@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+import numpy as np
+from btl import toolprofile
+from btl.params import DistanceParam
+from btl.shape import Shape
+from btl.toolpixmap import ProfilePixmap
+from btl.toolprofile import ToolProfile, get_profile_from_shape
+
+class ToolProfileTest(unittest.TestCase):
+    def setUp(self):
+        # A flat end mill with a diameter of 6 mm and a 15 mm cutting edge.
+        self.profile = ToolProfile([(0, 0), (3, 0), (3, 15)], 20, 15)
+
+    def test_full_width(self):
+        self.assertAlmostEqual(self.profile.get_effective_diameter_from_doc(2), 6)
+        self.assertAlmostEqual(self.profile.get_overlap_from_woc(2, 6), 12)
+
+    def test_partial_width(self):
+        self.assertAlmostEqual(self.profile.get_overlap_from_woc(2, 1.5), 3)
+        self.assertAlmostEqual(self.profile.get_overlap_from_woc(2, 4.5), 9)
+
+    def test_arrays_match_scalars(self):
+        docs = np.array([0.5, 2, 7, 19])
+        wocs = np.array([0.2, 3, 5, 6])
+        overlaps = self.profile.get_overlaps_from_wocs(docs, wocs)
+        for doc, woc, overlap in zip(docs, wocs, overlaps):
+            self.assertAlmostEqual(self.profile.get_overlap_from_woc(doc, woc), overlap)
+
+    def test_pixmap(self):
+        pixmap = ProfilePixmap(self.profile)
+        self.assertAlmostEqual(pixmap.get_overlap_from_woc(2, 1.5), 3)
+        self.assertAlmostEqual(pixmap.get_effective_diameter_from_doc(2), 6)
+
+class ShapeProfileTest(unittest.TestCase):
+    def test_cutting_edge_is_cached(self):
+        # Without a CuttingEdgeHeight, the cutting edge comes from the profile.
+        shape = Shape('dovetail')
+        shape.params.pop('CuttingEdgeHeight', None)
+        shape.set_param('Diameter', DistanceParam('Diameter', v=10))
+        shape.set_param('DovetailHeight', DistanceParam('DovetailHeight', v=5))
+        builder = toolprofile.profile_builders['dovetail']
+        counting = mock.Mock(side_effect=builder)
+        with mock.patch.dict(toolprofile.profile_builders, {'dovetail': counting}):
+            self.assertAlmostEqual(shape.get_cutting_edge(), 5)
+            self.assertAlmostEqual(shape.get_cutting_edge(), 5)
+            self.assertEqual(counting.call_count, 1)
+
+            # Changing a param invalidates the cache.
+            shape.set_param('DovetailHeight', 4)
+            self.assertAlmostEqual(shape.get_cutting_edge(), 4)
+            self.assertEqual(counting.call_count, 2)
+
+    def test_invalid_params(self):
+        # A lollipop mill with no diameter cannot be built.
+        shape = Shape('_fusion_lollipop_mill')
+        shape.set_param('Diameter', DistanceParam('Diameter', v=0))
+        self.assertIsNone(shape.get_cutting_edge())
+        self.assertIsNone(get_profile_from_shape(shape, 20))
+
+if __name__ == '__main__':
+    unittest.main()